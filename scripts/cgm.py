@@ -10,16 +10,26 @@ Commands:
 """
 import argparse
 import json
+import operator
 import os
 import re
 import sqlite3
 import sys
-from collections import defaultdict
+import tempfile
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from heapq import nlargest, nsmallest
+from itertools import chain
 from pathlib import Path
 
 try:
     import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
 except ImportError:
     print("Error: requests library required. Install with: pip install requests")
     sys.exit(1)
@@ -54,21 +64,86 @@ API_BASE = _normalize_nightscout_url(_raw_url)
 # Derive the API root from the entries URL
 API_ROOT = API_BASE.replace("/entries.json", "").rstrip("/")
 
+# Shared HTTP session - reuses keep-alive connections across Nightscout requests
+SESSION = requests.Session()
+SESSION.headers.update({"Accept-Encoding": "gzip"})
+RETRY_AFTER_MAX = 10  # Longest Retry-After (seconds) honoured before retrying a 429/503
+
+
+class _CappedRetry(Retry):
+    """Retry that honours Retry-After but never sleeps longer than RETRY_AFTER_MAX."""
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else min(retry_after, RETRY_AFTER_MAX)
+
+
+# Retry rate limiting and transient server errors (sleeping hosts answer 502/503),
+# not DNS/connect failures
+_http_adapter = HTTPAdapter(pool_maxsize=4, max_retries=_CappedRetry(
+    total=3, connect=0, backoff_factor=0.3, status_forcelist=(429, 502, 503, 504)
+))
+SESSION.mount("https://", _http_adapter)
+SESSION.mount("http://", _http_adapter)
+
 # Nightscout settings cache
 _cached_settings = None
+SETTINGS_CACHE_TTL = timedelta(hours=1)  # How long config.json settings stay valid
 
 def get_nightscout_settings():
-    """Fetch settings from Nightscout server (cached)."""
+    """
+    Fetch settings from Nightscout server.
+    Cached in memory and in config.json (with 1-hour expiry) so each CLI
+    invocation doesn't need a /status.json round-trip.
+    """
     global _cached_settings
     if _cached_settings is not None:
         return _cached_settings
     
+    # Check file cache
+    config = _load_config()
+    cached = config.get("nightscout_settings")
+    if cached and isinstance(cached.get("settings"), dict):
+        cached_time = cached.get("_checked_at")
+        if cached_time:
+            try:
+                checked = _parse_ns_datetime(cached_time)
+                if datetime.now(timezone.utc) - checked < SETTINGS_CACHE_TTL:
+                    _cached_settings = cached["settings"]
+                    return _cached_settings
+            except ValueError:
+                pass
+    
+    # Revalidate a stale cache with its validators; an unchanged status.json
+    # comes back as an empty 304
+    headers = {}
+    if cached and isinstance(cached.get("settings"), dict):
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
     try:
-        resp = requests.get(f"{API_ROOT}/status.json", timeout=10)
+        resp = SESSION.get(f"{API_ROOT}/status.json", headers=headers, timeout=10)
+        if headers and resp.status_code == 304:
+            _cached_settings = cached["settings"]
+            cached["_checked_at"] = datetime.now(timezone.utc).isoformat()
+            _save_config(config)
+            return _cached_settings
         resp.raise_for_status()
         data = resp.json()
         if isinstance(data, dict):
             _cached_settings = data.get("settings", {})
+            entry = {
+                "settings": _cached_settings,
+                "_checked_at": datetime.now(timezone.utc).isoformat()
+            }
+            for key, header in (("etag", "ETag"), ("last_modified", "Last-Modified")):
+                value = resp.headers.get(header)
+                if isinstance(value, str):
+                    entry[key] = value
+            config["nightscout_settings"] = entry
+            _save_config(config)
         else:
             _cached_settings = {}
     except (requests.RequestException, ValueError):
@@ -76,24 +151,45 @@ def get_nightscout_settings():
     
     return _cached_settings
 
+# Values derived from the settings dict, keyed on its identity so a refetch
+# (or a reset of _cached_settings) invalidates them
+_derived_settings = {}
+
+def _from_settings(key, derive):
+    """Return derive(settings) for the current settings, computing it once."""
+    settings = get_nightscout_settings()
+    cached = _derived_settings.get(key)
+    if cached is None or cached[0] is not settings:
+        cached = _derived_settings[key] = (settings, derive(settings))
+    return cached[1]
+
 def use_mmol():
     """Check if Nightscout is configured for mmol/L."""
-    units = get_nightscout_settings().get("units", "mg/dl")
-    return units.lower().startswith("mmol")
+    return _from_settings(
+        "mmol", lambda s: s.get("units", "mg/dl").lower().startswith("mmol")
+    )
+
+MGDL_PER_MMOL = 18.0182
 
 def convert_glucose(value_mgdl):
     """Convert mg/dL to mmol/L if Nightscout is configured for mmol."""
+    return round(value_mgdl / MGDL_PER_MMOL, 1) if use_mmol() else value_mgdl
+
+def _glucose_converter():
+    """
+    Return a mg/dL -> display-unit function with the unit setting resolved once.
+    Use in loops instead of calling convert_glucose per value.
+    """
     if use_mmol():
-        return round(value_mgdl / 18.0182, 1)
-    return value_mgdl
+        return lambda value_mgdl: round(value_mgdl / MGDL_PER_MMOL, 1)
+    return lambda value_mgdl: value_mgdl
 
 def get_unit_label():
     """Get the appropriate unit label based on Nightscout settings."""
     return "mmol/L" if use_mmol() else "mg/dL"
 
-def get_thresholds():
-    """Get glucose thresholds from Nightscout settings (in mg/dL)."""
-    thresholds = get_nightscout_settings().get("thresholds", {})
+def _thresholds_from(settings):
+    thresholds = settings.get("thresholds", {})
     return {
         "urgent_low": thresholds.get("bgLow", 55),
         "target_low": thresholds.get("bgTargetBottom", 70),
@@ -101,10 +197,23 @@ def get_thresholds():
         "urgent_high": thresholds.get("bgHigh", 250),
     }
 
+def get_thresholds():
+    """
+    Get glucose thresholds from Nightscout settings (in mg/dL).
+    The dict is shared between calls for the same settings - don't mutate it.
+    """
+    return _from_settings("thresholds", _thresholds_from)
+
 SKILL_DIR = Path(__file__).parent.parent
 DB_PATH = SKILL_DIR / "cgm_data.db"
 CONFIG_PATH = SKILL_DIR / "config.json"
 
+# Refresh pagination - a window of FETCH_WINDOW_DAYS of 5-minute readings fits in one page
+FETCH_PAGE_SIZE = 10000
+FETCH_WINDOW_DAYS = 30
+FETCH_WORKERS = 4
+INSERT_CHUNK_ROWS = 100  # 7 columns x 100 rows stays under SQLite's 999-parameter limit
+
 # Cached pump capabilities (None = not checked yet)
 _pump_capabilities = None
 
@@ -121,12 +230,23 @@ def _load_config():
 
 
 def _save_config(config):
-    """Save configuration to config.json."""
+    """
+    Save configuration to config.json.
+    Written to a uniquely named temp file and renamed so a concurrent
+    invocation never reads a half-written cache.
+    """
+    tmp_path = None
     try:
-        with open(CONFIG_PATH, "w") as f:
+        fd, tmp_path = tempfile.mkstemp(dir=CONFIG_PATH.parent, prefix=CONFIG_PATH.name, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
             json.dump(config, f, indent=2)
-    except IOError:
-        pass
+        os.replace(tmp_path, CONFIG_PATH)
+    except OSError:
+        if tmp_path is not None:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
 
 
 def detect_pump_capabilities():
@@ -154,7 +274,7 @@ def detect_pump_capabilities():
         cached_time = cached.get("_checked_at")
         if cached_time:
             try:
-                checked = datetime.fromisoformat(cached_time.replace("Z", "+00:00"))
+                checked = _parse_ns_datetime(cached_time)
                 if datetime.now(timezone.utc) - checked < timedelta(hours=24):
                     _pump_capabilities = cached
                     return _pump_capabilities
@@ -173,7 +293,7 @@ def detect_pump_capabilities():
     
     # Check treatments endpoint
     try:
-        resp = requests.get(f"{API_ROOT}/treatments.json", params={"count": 1}, timeout=5)
+        resp = SESSION.get(f"{API_ROOT}/treatments.json", params={"count": 1}, timeout=5)
         if resp.status_code == 200:
             data = resp.json()
             capabilities["has_treatments"] = bool(data and len(data) > 0)
@@ -182,7 +302,7 @@ def detect_pump_capabilities():
     
     # Check devicestatus endpoint (Loop/OpenAPS data)
     try:
-        resp = requests.get(f"{API_ROOT}/devicestatus.json", params={"count": 1}, timeout=5)
+        resp = SESSION.get(f"{API_ROOT}/devicestatus.json", params={"count": 1}, timeout=5)
         if resp.status_code == 200:
             data = resp.json()
             if data and len(data) > 0:
@@ -209,7 +329,7 @@ def detect_pump_capabilities():
     
     # Check profile endpoint
     try:
-        resp = requests.get(f"{API_ROOT}/profile.json", timeout=5)
+        resp = SESSION.get(f"{API_ROOT}/profile.json", timeout=5)
         if resp.status_code == 200:
             data = resp.json()
             if data and len(data) > 0:
@@ -244,9 +364,46 @@ OVERNIGHT_START_HOUR = 22  # Hour when overnight period begins
 OVERNIGHT_END_HOUR = 6  # Hour when overnight period ends
 
 
+def _is_uri(path):
+    """True if path is a SQLite URI (e.g. file:name?mode=memory&cache=shared)."""
+    return isinstance(path, str) and path.startswith("file:")
+
+
+def _connect(path):
+    """Open a writable connection to a database path or SQLite URI."""
+    return sqlite3.connect(path, uri=_is_uri(path))
+
+
+def _db_exists():
+    """True if DB_PATH names an existing database (URIs are assumed to exist)."""
+    return _is_uri(DB_PATH) or DB_PATH.exists()
+
+
+# A dateString's UTC offset in minutes, from its wall clock (offset dropped)
+# minus the instant it names; 0 for "Z", naive or unparsable strings
+_UTC_OFFSET_SQL = (
+    "COALESCE(CAST(round((julianday(substr({0}, 1, 19)) - julianday({0})) * 1440) AS INTEGER), 0)"
+)
+
+
+def _add_utc_offset_column(conn):
+    """Add readings.utc_offset to a database created before it, filled from date_string."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(readings)")}
+    if columns and "utc_offset" not in columns:
+        with conn:
+            conn.execute("ALTER TABLE readings ADD COLUMN utc_offset INTEGER NOT NULL DEFAULT 0")
+            conn.execute(f"UPDATE readings SET utc_offset = {_UTC_OFFSET_SQL.format('date_string')}")
+
+
 def create_database():
     """Initialize SQLite database for storing CGM readings."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = _connect(DB_PATH)
+    # WAL + NORMAL sync avoids a full fsync on every commit during refresh
+    conn.execute("PRAGMA journal_mode=WAL").fetchone()
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-20000")  # ~20 MB page cache
+    conn.execute("PRAGMA mmap_size=268435456")  # serve reads from a 256 MB memory map
     conn.execute('''CREATE TABLE IF NOT EXISTS readings (
         id TEXT PRIMARY KEY,
         sgv INTEGER,
@@ -254,22 +411,58 @@ def create_database():
         date_string TEXT,
         trend INTEGER,
         direction TEXT,
-        device TEXT
+        device TEXT,
+        utc_offset INTEGER NOT NULL DEFAULT 0
     )''')
+    _add_utc_offset_column(conn)
+    # Covering index: date-range queries that only need sgv and the local hour
+    # or weekday never touch the table
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_readings_date_sgv_offset ON readings(date_ms, sgv, utc_offset)"
+    )
+    # superseded by the above
+    conn.execute("DROP INDEX IF EXISTS idx_readings_date_ms")
+    conn.execute("DROP INDEX IF EXISTS idx_readings_date_sgv")
     conn.commit()
     return conn
 
 
+# Cached read-only connection, reopened if DB_PATH changes
+_read_conn_cache = None
+
+def _read_conn():
+    """
+    Return a shared read-only connection to DB_PATH.
+    Read paths reuse it instead of opening (and parsing the header/WAL of)
+    the database on every call; writes go through create_database().
+    """
+    global _read_conn_cache
+    path = str(DB_PATH)
+    if _read_conn_cache is None or _read_conn_cache[0] != path:
+        if _read_conn_cache is not None:
+            _read_conn_cache[1].close()
+        uri = path if _is_uri(DB_PATH) else f"{Path(path).resolve().as_uri()}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.execute("PRAGMA query_only=ON")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-65536")  # ~64 MB page cache, kept across calls
+        conn.execute("PRAGMA mmap_size=268435456")
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(readings)")}
+        if columns and "utc_offset" not in columns:
+            create_database().close()  # adds utc_offset to a database that predates it
+        _read_conn_cache = (path, conn)
+    return _read_conn_cache[1]
+
+
 def ensure_data(days=90):
     """
     Ensure we have data in the database. Auto-fetches on first use.
     Returns True if data is available, False if fetch failed.
     """
-    if DB_PATH.exists():
+    if _db_exists():
         # Check if we actually have readings
-        conn = sqlite3.connect(DB_PATH)
+        conn = _read_conn()
         count = conn.execute("SELECT COUNT(*) FROM readings").fetchone()[0]
-        conn.close()
         if count > 0:
             return True
     
@@ -295,12 +488,11 @@ def ensure_fresh_data(days=90, max_stale_minutes=30):
     Returns:
         True if data is available and fresh, False if sync failed
     """
-    if not DB_PATH.exists():
+    if not _db_exists():
         return ensure_data(days)
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = _read_conn()
     result = conn.execute("SELECT MAX(date_ms) FROM readings").fetchone()
-    conn.close()
     
     if not result or not result[0]:
         return ensure_data(days)
@@ -323,54 +515,121 @@ def ensure_fresh_data(days=90, max_stale_minutes=30):
     return True
 
 
-def fetch_and_store(days=90):
-    """Fetch CGM data from Nightscout and store in database."""
-    conn = create_database()
-    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
-    cutoff_ms = int(cutoff.timestamp() * 1000)
+def _sgv_rows(entries):
+    """Reduce API entries to readings-table tuples, keeping only sgv entries."""
+    return [
+        (e.get("_id"), e.get("sgv"), e.get("date"),
+         e.get("dateString"), e.get("trend"),
+         e.get("direction"), e.get("device"))
+        for e in entries if e.get("type") == "sgv"
+    ]
 
-    total_new = 0
-    oldest_date = None
 
+def _fetch_window(lo_ms, hi_ms=None):
+    """
+    Fetch readings-table rows for entries with lo_ms <= date <= hi_ms
+    (no upper bound if hi_ms is None). A full page means the window is
+    saturated, so keep paging backwards within it.
+    Each page is reduced to tuples as soon as it arrives, so at most one
+    page of decoded JSON dicts per worker is alive at a time.
+    """
+    rows = []
     while True:
-        params = {"count": 10000}
-        if oldest_date:
-            params["find[date][$lte]"] = oldest_date
+        params = {"count": FETCH_PAGE_SIZE, "find[date][$gte]": lo_ms}
+        if hi_ms is not None:
+            params["find[date][$lte]"] = hi_ms
 
-        try:
-            resp = requests.get(API_BASE, params=params, timeout=30)
-            resp.raise_for_status()
-            entries = resp.json()
-        except requests.RequestException as e:
-            return {"error": f"Failed to fetch data: {e}"}
+        resp = SESSION.get(API_BASE, params=params, timeout=30)
+        resp.raise_for_status()
+        page = resp.json()
+        rows.extend(_sgv_rows(page))
 
-        if not entries:
-            break
+        if len(page) < FETCH_PAGE_SIZE:
+            return rows
+        # Nightscout returns entries newest-first, so the last one is the oldest
+        oldest = page[-1].get("date")
+        if oldest is None or oldest <= lo_ms:
+            return rows
+        hi_ms = oldest - 1
 
-        for e in entries:
-            if e.get("type") == "sgv":
-                cursor = conn.execute(
-                    "SELECT 1 FROM readings WHERE id = ?", (e.get("_id"),)
-                )
-                if not cursor.fetchone():
-                    conn.execute(
-                        '''INSERT INTO readings VALUES (?,?,?,?,?,?,?)''',
-                        (e.get("_id"), e.get("sgv"), e.get("date"),
-                         e.get("dateString"), e.get("trend"),
-                         e.get("direction"), e.get("device"))
-                    )
-                    total_new += 1
-        conn.commit()
-
-        oldest = min(e.get("date", float("inf")) for e in entries)
-        if oldest < cutoff_ms:
-            break
-        oldest_date = oldest - 1
 
-    # Get total count before closing connection
-    total_readings = conn.execute("SELECT COUNT(*) FROM readings").fetchone()[0]
-    conn.close()
-    
+def _insert_readings(conn, rows):
+    """
+    INSERT OR IGNORE reading tuples, INSERT_CHUNK_ROWS per statement.
+    Multi-row VALUES cuts per-row statement overhead; the leftover rows
+    that don't fill a chunk go through the single-row statement. Each row's
+    utc_offset is derived from its date_string on the way in.
+    """
+    head = ("INSERT OR IGNORE INTO readings"
+            " (id, sgv, date_ms, date_string, trend, direction, device, utc_offset)"
+            " SELECT column1, column2, column3, column4, column5, column6, column7, "
+            + _UTC_OFFSET_SQL.format("column4") + " FROM (VALUES ")
+    row_marks = "(?,?,?,?,?,?,?)"
+    n_full = len(rows) - len(rows) % INSERT_CHUNK_ROWS
+    conn.executemany(
+        head + ",".join([row_marks] * INSERT_CHUNK_ROWS) + ")",
+        (tuple(chain.from_iterable(rows[i:i + INSERT_CHUNK_ROWS]))
+         for i in range(0, n_full, INSERT_CHUNK_ROWS))
+    )
+    conn.executemany(head + row_marks + ")", rows[n_full:])
+
+
+def fetch_and_store(days=90):
+    """Fetch CGM data from Nightscout and store in database."""
+    conn = create_database()
+    now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+    cutoff_ms = now_ms - days * 86400000
+
+    # Split the range into windows that each fit in one page and fetch them
+    # concurrently - a backfill costs one round-trip instead of one per page
+    n_windows = max(1, -(-days // FETCH_WINDOW_DAYS))
+    step = -(-(now_ms - cutoff_ms) // n_windows)
+    windows = [
+        (cutoff_ms + i * step, cutoff_ms + (i + 1) * step - 1)
+        for i in range(n_windows - 1)
+    ]
+    # The newest window stays open-ended so nothing stamped after "now" is missed
+    windows.append((cutoff_ms + (n_windows - 1) * step, None))
+
+    t = get_thresholds()
+    total_new = 0
+    error = None
+    try:
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+            futures = [pool.submit(_fetch_window, *w) for w in windows]
+            # Store each window as it completes (one transaction per window; the
+            # PRIMARY KEY on id skips duplicates), so one failed window doesn't
+            # discard the ones that succeeded. The hourly rollup is folded in
+            # the same transaction, so find_patterns never has to write.
+            for future in as_completed(futures):
+                try:
+                    rows = future.result()
+                except requests.RequestException as e:
+                    error = error or e
+                    continue
+                with conn:
+                    changes_before = conn.total_changes
+                    _insert_readings(conn, rows)
+                    window_new = conn.total_changes - changes_before
+                    if window_new:
+                        _update_hourly_rollup(conn, t)
+                total_new += window_new
+
+        # Planner statistics so range scans use the date_ms index: a full ANALYZE
+        # once, after the initial backfill; later refreshes let SQLite decide
+        if total_new:
+            has_stats = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+            ).fetchone()
+            conn.execute("PRAGMA optimize" if has_stats else "ANALYZE")
+
+        # Get total count before closing connection
+        total_readings = conn.execute("SELECT COUNT(*) FROM readings").fetchone()[0]
+    finally:
+        conn.close()
+
+    if error is not None:
+        return {"error": f"Failed to fetch data: {error}", "new_readings": total_new}
     return {
         "status": "success",
         "new_readings": total_new,
@@ -379,38 +638,124 @@ def fetch_and_store(days=90):
     }
 
 
-def get_stats(values):
-    """Calculate basic statistics for glucose values."""
-    if not values:
-        return {}
-    values = sorted(values)
+def _std_from_sums(n, total, sum_sq):
+    """Population std from count, sum and sum of squares (exact for integer readings)."""
+    return max(n * sum_sq - total * total, 0) ** 0.5 / n
+
+
+def _raw_stats(values):
+    """
+    Return (count, mean, std) of raw mg/dL values.
+    Uses C-level sum/map reductions instead of per-element generator passes.
+    """
     n = len(values)
-    mean = sum(values) / n
-    std = (sum((x - mean) ** 2 for x in values) / n) ** 0.5
+    total = sum(values)
+    sum_sq = sum(map(operator.mul, values, values))
+    return n, total / n, _std_from_sums(n, total, sum_sq)
+
+
+def _order_stats(values):
+    """
+    Return (min, max, median) without sorting every value.
+    Readings are integers in a narrow range, so counting them and walking the
+    few hundred distinct values is linear; the median is sorted(values)[n // 2].
+    """
+    counts = Counter(values)
+    keys = sorted(counts)
+    remaining = len(values) // 2
+    for median in keys:
+        remaining -= counts[median]
+        if remaining < 0:
+            break
+    return keys[0], keys[-1], median
+
+
+def _format_stats(n, mean, std, min_sgv, max_sgv, median):
+    """Build the statistics dict from raw mg/dL aggregates."""
+    convert = _glucose_converter()
     return {
         "count": n,
-        "mean": convert_glucose(round(mean, 1)),
-        "std": convert_glucose(round(std, 1)),
-        "min": convert_glucose(values[0]),
-        "max": convert_glucose(values[-1]),
-        "median": convert_glucose(values[n // 2]),
+        "mean": convert(round(mean, 1)),
+        "std": convert(round(std, 1)),
+        "min": convert(min_sgv),
+        "max": convert(max_sgv),
+        "median": convert(median),
         "unit": get_unit_label()
     }
 
 
+def _format_tir(n, very_low, low, in_range, high, very_high):
+    """Build the time-in-range dict from per-range reading counts."""
+    return {
+        "very_low_pct": round(very_low / n * 100, 1),
+        "low_pct": round(low / n * 100, 1),
+        "in_range_pct": round(in_range / n * 100, 1),
+        "high_pct": round(high / n * 100, 1),
+        "very_high_pct": round(very_high / n * 100, 1),
+    }
+
+
+def get_stats(values):
+    """Calculate basic statistics for glucose values."""
+    if not values:
+        return {}
+    n, mean, std = _raw_stats(values)
+    return _format_stats(n, mean, std, *_order_stats(values))
+
+
+def _tir_counts(values, t):
+    """Count readings in the five ranges (very low .. very high) in a single pass."""
+    urgent_low, target_low = t["urgent_low"], t["target_low"]
+    target_high, urgent_high = t["target_high"], t["urgent_high"]
+    very_low = low = in_range = high = very_high = 0
+    for v in values:
+        if v < target_low:
+            if v < urgent_low:
+                very_low += 1
+            else:
+                low += 1
+        elif v <= target_high:
+            in_range += 1
+        elif v <= urgent_high:
+            high += 1
+        else:
+            very_high += 1
+    return very_low, low, in_range, high, very_high
+
+
 def get_time_in_range(values):
     """Calculate time-in-range percentages using Nightscout thresholds."""
     if not values:
         return {}
-    t = get_thresholds()
-    n = len(values)
-    return {
-        "very_low_pct": round(sum(1 for v in values if v < t["urgent_low"]) / n * 100, 1),
-        "low_pct": round(sum(1 for v in values if t["urgent_low"] <= v < t["target_low"]) / n * 100, 1),
-        "in_range_pct": round(sum(1 for v in values if t["target_low"] <= v <= t["target_high"]) / n * 100, 1),
-        "high_pct": round(sum(1 for v in values if t["target_high"] < v <= t["urgent_high"]) / n * 100, 1),
-        "very_high_pct": round(sum(1 for v in values if v > t["urgent_high"]) / n * 100, 1),
-    }
+    return _format_tir(len(values), *_tir_counts(values, get_thresholds()))
+
+
+# fromisoformat accepts a trailing "Z" (and any fraction length) from Python 3.11;
+# older versions need it spelled as an offset
+_FROMISOFORMAT_ACCEPTS_Z = sys.version_info >= (3, 11)
+
+
+def _parse_ns_datetime(value):
+    """Parse a Nightscout ISO-8601 timestamp such as 2024-06-01T12:34:56.789Z."""
+    if _FROMISOFORMAT_ACCEPTS_Z:
+        return datetime.fromisoformat(value)
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+# Hour-of-day and weekday buckets (analyze_cgm, query_patterns, find_patterns,
+# the heatmap, the weekday chart and the weekly sparklines) follow the wall
+# clock in each reading's dateString: date_ms shifted by its utc_offset, so an
+# uploader sending -05:00 sees its readings at the hour it recorded them.
+# view_day, the dated sparkline and find_worst_days use local days instead.
+MS_PER_HOUR = 3600000
+MS_PER_DAY = 86400000
+HOUR_LABELS = tuple(f"{h:02d}:00" for h in range(24))  # "HH:00" by hour of day
+
+
+# A reading's wall-clock hour of day and weekday (0=Monday; 1970-01-01 was a
+# Thursday) in SQL integer math
+_LOCAL_HOUR_SQL = "((date_ms + utc_offset * 60000) / 3600000 % 24)"
+_LOCAL_WEEKDAY_SQL = "(((date_ms + utc_offset * 60000) / 86400000 + 3) % 7)"
 
 
 def analyze_cgm(days=90):
@@ -418,50 +763,72 @@ def analyze_cgm(days=90):
     if not ensure_data(days):
         return {"error": "Could not fetch data from Nightscout. Check your NIGHTSCOUT_URL."}
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = _read_conn()
     cutoff = datetime.now(timezone.utc) - timedelta(days=days)
     cutoff_ms = int(cutoff.timestamp() * 1000)
-
-    rows = conn.execute(
-        "SELECT sgv, date_ms, date_string FROM readings WHERE date_ms >= ? AND sgv > 0 ORDER BY date_ms",
-        (cutoff_ms,)
+    params = {**get_thresholds(), "cutoff_ms": cutoff_ms}
+
+    # One fused scan: SQLite aggregates per wall-clock hour (derived from date_ms
+    # and utc_offset with integer math), and the 24 hourly rows are reduced to
+    # the overall figures
+    hourly_rows = conn.execute(
+        f"""
+        SELECT {_LOCAL_HOUR_SQL} AS hour,
+               COUNT(*), SUM(sgv), SUM(sgv * sgv), MIN(sgv), MAX(sgv),
+               SUM(CASE WHEN sgv < :urgent_low THEN 1 ELSE 0 END),
+               SUM(CASE WHEN sgv >= :urgent_low AND sgv < :target_low THEN 1 ELSE 0 END),
+               SUM(CASE WHEN sgv BETWEEN :target_low AND :target_high THEN 1 ELSE 0 END),
+               SUM(CASE WHEN sgv > :target_high AND sgv <= :urgent_high THEN 1 ELSE 0 END),
+               SUM(CASE WHEN sgv > :urgent_high THEN 1 ELSE 0 END)
+        FROM readings WHERE date_ms >= :cutoff_ms AND sgv > 0
+        GROUP BY hour ORDER BY hour
+        """,
+        params
     ).fetchall()
-    conn.close()
 
-    if not rows:
+    if not hourly_rows:
         return {"error": "No data found for the specified period."}
 
-    values = [r[0] for r in rows]
-    stats = get_stats(values)
-    tir = get_time_in_range(values)
+    columns = list(zip(*hourly_rows))
+    n, total, sum_sq = sum(columns[1]), sum(columns[2]), sum(columns[3])
+    min_sgv, max_sgv = min(columns[4]), max(columns[5])
+    very_low, low, in_range, high, very_high = map(sum, columns[6:])
+
+    median = conn.execute(
+        "SELECT sgv FROM readings WHERE date_ms >= ? AND sgv > 0 ORDER BY sgv LIMIT 1 OFFSET ?",
+        (cutoff_ms, n // 2)
+    ).fetchone()[0]
+    first_ds = conn.execute(
+        "SELECT date_string FROM readings WHERE date_ms >= ? AND sgv > 0 ORDER BY date_ms LIMIT 1",
+        (cutoff_ms,)
+    ).fetchone()[0]
+    last_ds = conn.execute(
+        "SELECT date_string FROM readings WHERE date_ms >= ? AND sgv > 0 ORDER BY date_ms DESC LIMIT 1",
+        (cutoff_ms,)
+    ).fetchone()[0]
+
+    raw_mean = total / n
+    raw_std = _std_from_sums(n, total, sum_sq)
+    stats = _format_stats(n, raw_mean, raw_std, min_sgv, max_sgv, median)
+    tir = _format_tir(n, very_low, low, in_range, high, very_high)
 
     # GMI (Glucose Management Indicator) - estimated A1C
     # Uses raw mg/dL mean, not converted value
-    raw_mean = sum(values) / len(values)
     gmi = round(3.31 + (0.02392 * raw_mean), 1)
     
     # Coefficient of Variation (uses raw values)
-    raw_std = (sum((x - raw_mean) ** 2 for x in values) / len(values)) ** 0.5
     cv = round((raw_std / raw_mean) * 100, 1) if raw_mean else 0
 
-    # Hourly breakdown
-    hourly = defaultdict(list)
-    for sgv, _, ds in rows:
-        try:
-            dt = datetime.fromisoformat(ds.replace("Z", "+00:00"))
-            hourly[dt.hour].append(sgv)
-        except (ValueError, TypeError):
-            pass
-
-    hourly_avg = {h: convert_glucose(round(sum(v) / len(v), 0)) for h, v in sorted(hourly.items())}
+    convert = _glucose_converter()
+    hourly_avg = {row[0]: convert(round(row[2] / row[1], 0)) for row in hourly_rows}
 
     return {
         "date_range": {
-            "from": rows[0][2][:10] if rows[0][2] else "unknown",
-            "to": rows[-1][2][:10] if rows[-1][2] else "unknown",
+            "from": first_ds[:10] if first_ds else "unknown",
+            "to": last_ds[:10] if last_ds else "unknown",
             "days_analyzed": days
         },
-        "readings": len(values),
+        "readings": n,
         "statistics": stats,
         "time_in_range": tir,
         "gmi_estimated_a1c": gmi,
@@ -586,31 +953,31 @@ def compare_periods(period1_str, period2_str):
     if not ensure_data(max(90, (datetime.now(timezone.utc) - start1).days, (datetime.now(timezone.utc) - start2).days)):
         return {"error": "Could not fetch data from Nightscout. Check your NIGHTSCOUT_URL."}
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = _read_conn()
     
     # Helper function to get data for a period
     def get_period_data(start_dt, end_dt):
         start_ms = int(start_dt.timestamp() * 1000)
         end_ms = int(end_dt.timestamp() * 1000)
         
-        rows = conn.execute(
-            "SELECT sgv, date_ms, date_string FROM readings WHERE date_ms >= ? AND date_ms < ? AND sgv > 0 ORDER BY date_ms",
+        # Only the values are needed - stream them into a compact int array
+        # rather than materializing a list of (sgv, date_ms, date_string) tuples
+        values = array("i", (r[0] for r in conn.execute(
+            "SELECT sgv FROM readings WHERE date_ms >= ? AND date_ms < ? AND sgv > 0",
             (start_ms, end_ms)
-        ).fetchall()
+        )))
         
-        if not rows:
+        if not values:
             return None
         
-        values = [r[0] for r in rows]
         stats = get_stats(values)
         tir = get_time_in_range(values)
         
         # GMI calculation
-        raw_mean = sum(values) / len(values)
+        _, raw_mean, raw_std = _raw_stats(values)
         gmi = round(3.31 + (0.02392 * raw_mean), 1)
         
         # CV calculation
-        raw_std = (sum((x - raw_mean) ** 2 for x in values) / len(values)) ** 0.5
         cv = round((raw_std / raw_mean) * 100, 1) if raw_mean else 0
         
         return {
@@ -630,7 +997,6 @@ def compare_periods(period1_str, period2_str):
     period1_data = get_period_data(start1, end1)
     period2_data = get_period_data(start2, end2)
     
-    conn.close()
     
     if not period1_data:
         return {"error": f"No data found for period 1: {desc1}"}
@@ -760,10 +1126,32 @@ def _identify_regressions(deltas):
     return regressions if regressions else ["No significant regressions"]
 
 
+CURRENT_STATUS_LABELS = ("VERY LOW - urgent", "low", "in range", "high", "VERY HIGH")
+READING_STATUS_LABELS = ("very_low", "low", "in_range", "high", "very_high")
+
+
+def _status_classifier(labels):
+    """
+    Return a function mapping sgv (mg/dL) to one of five labels, ordered
+    very low .. very high, with the thresholds resolved once.
+    Lower bounds are exclusive and upper bounds inclusive, like _tir_counts.
+    """
+    t = get_thresholds()
+    target_low = t["target_low"]
+    lower = (t["urgent_low"], target_low)
+    upper = (t["target_high"], t["urgent_high"])
+
+    def classify(sgv):
+        if sgv < target_low:
+            return labels[bisect_right(lower, sgv)]
+        return labels[2 + bisect_left(upper, sgv)]
+    return classify
+
+
 def get_current_glucose():
     """Get the most recent glucose reading from Nightscout."""
     try:
-        resp = requests.get(API_BASE, params={"count": 1}, timeout=10)
+        resp = SESSION.get(API_BASE, params={"count": 1}, timeout=10)
         resp.raise_for_status()
         data = resp.json()
     except requests.RequestException as e:
@@ -772,18 +1160,7 @@ def get_current_glucose():
     if data:
         e = data[0]
         sgv = e.get("sgv", 0)
-        t = get_thresholds()
-        
-        if sgv < t["urgent_low"]:
-            status = "VERY LOW - urgent"
-        elif sgv < t["target_low"]:
-            status = "low"
-        elif sgv <= t["target_high"]:
-            status = "in range"
-        elif sgv <= t["urgent_high"]:
-            status = "high"
-        else:
-            status = "VERY HIGH"
+        status = _status_classifier(CURRENT_STATUS_LABELS)(sgv)
 
         return {
             "glucose": convert_glucose(sgv),
@@ -795,6 +1172,30 @@ def get_current_glucose():
     return {"error": "No data available"}
 
 
+SPARK_BLOCKS = " ▁▂▃▄▅▆▇█"
+
+
+class _GlyphCache(dict):
+    """Memoizes render(value) per distinct value; readings repeat, so most lookups hit."""
+
+    def __init__(self, render):
+        super().__init__()
+        self.render = render
+
+    def __missing__(self, value):
+        glyph = self[value] = self.render(value)
+        return glyph
+
+
+def _block_char(v, min_val=40, max_val=400):
+    """Map a glucose value to one of the 9 sparkline block characters."""
+    # Clamp value to range
+    v = max(min_val, min(max_val, v))
+    # Normalize to 0-8 range (9 characters including space)
+    normalized = (v - min_val) / (max_val - min_val)
+    return SPARK_BLOCKS[max(0, min(8, int(normalized * 8)))]
+
+
 def make_sparkline(values, min_val=40, max_val=400):
     """
     Create a sparkline string from a list of glucose values.
@@ -803,19 +1204,8 @@ def make_sparkline(values, min_val=40, max_val=400):
     if not values:
         return ""
     
-    blocks = " ▁▂▃▄▅▆▇█"
-    
-    sparkline = []
-    for v in values:
-        # Clamp value to range
-        v = max(min_val, min(max_val, v))
-        # Normalize to 0-8 range (9 characters including space)
-        normalized = (v - min_val) / (max_val - min_val)
-        idx = int(normalized * 8)
-        idx = max(0, min(8, idx))
-        sparkline.append(blocks[idx])
-    
-    return "".join(sparkline)
+    glyphs = _GlyphCache(lambda v: _block_char(v, min_val, max_val))
+    return "".join(map(glyphs.__getitem__, values))
 
 
 def show_sparkline(hours=24, use_color=True, date_str=None, hour_start=None, hour_end=None):
@@ -827,7 +1217,7 @@ def show_sparkline(hours=24, use_color=True, date_str=None, hour_start=None, hou
     if not ensure_data():
         return
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = _read_conn()
     
     if date_str:
         # Specific date mode
@@ -838,11 +1228,11 @@ def show_sparkline(hours=24, use_color=True, date_str=None, hour_start=None, hou
             return
         
         query = """
-        SELECT sgv, date_string FROM readings 
-        WHERE date(datetime(date_ms/1000, 'unixepoch', 'localtime')) = ?
+        SELECT sgv, date_ms FROM readings 
+        WHERE date_ms >= ? AND date_ms < ?
           AND sgv > 0
         """
-        params = [target_date.isoformat()]
+        params = list(_local_day_range_ms(target_date))
         
         if hour_start is not None and hour_end is not None:
             query += """ AND CAST(strftime('%H', datetime(date_ms/1000, 'unixepoch', 'localtime')) AS INTEGER) 
@@ -863,12 +1253,11 @@ def show_sparkline(hours=24, use_color=True, date_str=None, hour_start=None, hou
         cutoff_ms = int(cutoff.timestamp() * 1000)
         
         rows = conn.execute(
-            "SELECT sgv, date_string FROM readings WHERE date_ms >= ? AND sgv > 0 ORDER BY date_ms",
+            "SELECT sgv, date_ms FROM readings WHERE date_ms >= ? AND sgv > 0 ORDER BY date_ms",
             (cutoff_ms,)
         ).fetchall()
         title = f"{hours}h"
     
-    conn.close()
     
     if not rows:
         print("No data found for the requested period.")
@@ -886,9 +1275,9 @@ def show_sparkline(hours=24, use_color=True, date_str=None, hour_start=None, hou
     
     # Get time range (convert to local time for display)
     try:
-        first_dt = datetime.fromisoformat(rows[0][1].replace("Z", "+00:00")).astimezone()
-        last_dt = datetime.fromisoformat(rows[-1][1].replace("Z", "+00:00")).astimezone()
-    except (ValueError, TypeError):
+        first_dt = datetime.fromtimestamp(rows[0][1] / 1000, tz=timezone.utc).astimezone()
+        last_dt = datetime.fromtimestamp(rows[-1][1] / 1000, tz=timezone.utc).astimezone()
+    except (ValueError, TypeError, OverflowError, OSError):
         print("Error: Invalid date format in database. Try running 'refresh' command.")
         return
     
@@ -900,29 +1289,10 @@ def show_sparkline(hours=24, use_color=True, date_str=None, hour_start=None, hou
         RESET = '\033[0m'
         BOLD = '\033[1m'
         
-        blocks = " ▁▂▃▄▅▆▇█"
-        sparkline = []
-        for v in values:
-            # Determine color based on range
-            if v < t["urgent_low"]:
-                color = RED  # Urgent low
-            elif v < t["target_low"]:
-                color = YELLOW  # Low
-            elif v <= t["target_high"]:
-                color = GREEN  # In range
-            elif v <= t["urgent_high"]:
-                color = YELLOW  # High
-            else:
-                color = RED  # Urgent high
-            
-            # Normalize to block character
-            clamped = max(40, min(400, v))
-            normalized = (clamped - 40) / 360
-            idx = int(normalized * 8)
-            idx = max(0, min(8, idx))
-            sparkline.append(f"{color}{blocks[idx]}{RESET}")
-        
-        spark_str = "".join(sparkline)
+        # Color based on range: urgent low/high red, low/high yellow, in range green
+        color_of = _status_classifier((RED, YELLOW, GREEN, YELLOW, RED))
+        glyphs = _GlyphCache(lambda v: f"{color_of(v)}{_block_char(v)}{RESET}")
+        spark_str = "".join(map(glyphs.__getitem__, values))
         print(f"\n{BOLD}Glucose Sparkline ({title}){RESET}")
         print(f"  {first_dt.strftime('%H:%M')} {spark_str} {last_dt.strftime('%H:%M')}")
         print(f"\n  {GREEN}█{RESET} In Range ({convert_glucose(t['target_low'])}-{convert_glucose(t['target_high'])} {get_unit_label()})  {YELLOW}█{RESET} Low/High  {RED}█{RESET} Urgent")
@@ -952,15 +1322,15 @@ def show_sparkline_week(days=7, use_color=True):
     if not ensure_data(days):
         return
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = _read_conn()
     cutoff = datetime.now(timezone.utc) - timedelta(days=days)
     cutoff_ms = int(cutoff.timestamp() * 1000)
     
     rows = conn.execute(
-        "SELECT sgv, date_string FROM readings WHERE date_ms >= ? AND sgv > 0 ORDER BY date_ms",
+        "SELECT sgv, date_ms + utc_offset * 60000 FROM readings"
+        " WHERE date_ms >= ? AND sgv > 0 ORDER BY date_ms",
         (cutoff_ms,)
     ).fetchall()
-    conn.close()
     
     if not rows:
         print("No data found for the requested period.")
@@ -968,15 +1338,20 @@ def show_sparkline_week(days=7, use_color=True):
     
     t = get_thresholds()
     
-    # Group readings by date
-    by_date = defaultdict(list)
-    for sgv, ds in rows:
-        try:
-            dt = datetime.fromisoformat(ds.replace("Z", "+00:00"))
-            date_key = dt.strftime("%Y-%m-%d")
-            by_date[date_key].append((dt.hour + dt.minute/60, sgv))
-        except (ValueError, TypeError):
-            pass
+    # Accumulate per wall-clock day number: sum and count for each of 48
+    # half-hour buckets, plus the day's in-range count - no per-reading lists
+    target_low, target_high = t["target_low"], t["target_high"]
+    by_date = {}
+    for sgv, local_ms in rows:
+        day_number, offset_ms = divmod(local_ms, MS_PER_DAY)
+        day = by_date.get(day_number)
+        if day is None:
+            day = by_date[day_number] = ([0] * 48, [0] * 48, [0])
+        bucket_idx = offset_ms // (MS_PER_HOUR // 2)
+        day[0][bucket_idx] += sgv
+        day[1][bucket_idx] += 1
+        if target_low <= sgv <= target_high:
+            day[2][0] += 1
     
     if use_color:
         GREEN = '\033[92m'
@@ -988,7 +1363,7 @@ def show_sparkline_week(days=7, use_color=True):
     else:
         GREEN = YELLOW = RED = RESET = BOLD = DIM = ''
     
-    blocks = " ▁▂▃▄▅▆▇█"
+    color_of = _status_classifier((RED, YELLOW, GREEN, YELLOW, RED))
     
     print(f"\n{BOLD}Glucose Sparklines (Last {days} Days){RESET}")
     print(f"  {DIM}midnight                  noon                  midnight{RESET}")
@@ -997,58 +1372,28 @@ def show_sparkline_week(days=7, use_color=True):
     # Sort dates and show most recent at top
     sorted_dates = sorted(by_date.keys(), reverse=True)
     
-    for date_str in sorted_dates[:days]:
-        readings = by_date[date_str]
-        if not readings:
-            continue
+    for day_number in sorted_dates[:days]:
+        sums, counts, (in_range,) = by_date[day_number]
         
-        # Create 48 buckets (30-min intervals)
-        buckets = [[] for _ in range(48)]
-        for hour_frac, sgv in readings:
-            bucket_idx = int(hour_frac * 2)  # 2 buckets per hour
-            bucket_idx = max(0, min(47, bucket_idx))
-            buckets[bucket_idx].append(sgv)
-        
-        # Build sparkline
+        # Build sparkline from the 48 half-hour buckets
         sparkline = []
-        for bucket in buckets:
-            if not bucket:
+        for bucket_sum, bucket_count in zip(sums, counts):
+            if not bucket_count:
                 sparkline.append(f"{DIM}·{RESET}" if use_color else "·")
             else:
-                avg_sgv = sum(bucket) / len(bucket)
-                
-                # Color based on range
-                if use_color:
-                    if avg_sgv < t["urgent_low"]:
-                        color = RED
-                    elif avg_sgv < t["target_low"]:
-                        color = YELLOW
-                    elif avg_sgv <= t["target_high"]:
-                        color = GREEN
-                    elif avg_sgv <= t["urgent_high"]:
-                        color = YELLOW
-                    else:
-                        color = RED
-                else:
-                    color = ''
-                
-                # Normalize to block character
-                clamped = max(40, min(400, avg_sgv))
-                normalized = (clamped - 40) / 360
-                idx = int(normalized * 8)
-                idx = max(0, min(8, idx))
-                sparkline.append(f"{color}{blocks[idx]}{RESET}" if use_color else blocks[idx])
+                avg_sgv = bucket_sum / bucket_count
+                block = _block_char(avg_sgv)
+                sparkline.append(f"{color_of(avg_sgv)}{block}{RESET}" if use_color else block)
         
         spark_str = "".join(sparkline)
         
         # Calculate day stats
-        day_values = [r[1] for r in readings]
-        avg = sum(day_values) / len(day_values)
-        in_range = sum(1 for v in day_values if t["target_low"] <= v <= t["target_high"])
-        tir = (in_range / len(day_values)) * 100
+        day_count = sum(counts)
+        avg = sum(sums) / day_count
+        tir = (in_range / day_count) * 100
         
-        # Parse date for display
-        dt = datetime.strptime(date_str, "%Y-%m-%d")
+        # Date for display
+        dt = datetime(1970, 1, 1) + timedelta(days=day_number)
         day_name = dt.strftime("%a")
         date_display = dt.strftime("%m/%d")
         
@@ -1072,26 +1417,28 @@ def show_heatmap(days=90, use_color=True):
     if not ensure_data(days):
         return
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = _read_conn()
     cutoff = datetime.now(timezone.utc) - timedelta(days=days)
     cutoff_ms = int(cutoff.timestamp() * 1000)
 
-    rows = conn.execute(
-        "SELECT sgv, date_string FROM readings WHERE date_ms >= ? AND sgv > 0",
-        (cutoff_ms,)
-    ).fetchall()
-    conn.close()
+    t = get_thresholds()
 
-    by_day_hour = defaultdict(list)
-    for sgv, ds in rows:
-        try:
-            dt = datetime.fromisoformat(ds.replace("Z", "+00:00"))
-            by_day_hour[(dt.weekday(), dt.hour)].append(sgv)
-        except (ValueError, TypeError):
-            pass
+    # Count in-range and total readings per (wall-clock weekday, hour) inside SQLite
+    by_day_hour = {
+        (dow, hour): (in_range, total)
+        for dow, hour, in_range, total in conn.execute(
+            f"""
+            SELECT {_LOCAL_WEEKDAY_SQL} AS dow, {_LOCAL_HOUR_SQL} AS hour,
+                   SUM(CASE WHEN sgv BETWEEN :target_low AND :target_high THEN 1 ELSE 0 END),
+                   COUNT(*)
+            FROM readings WHERE date_ms >= :cutoff_ms AND sgv > 0
+            GROUP BY dow, hour
+            """,
+            {**t, "cutoff_ms": cutoff_ms}
+        )
+    }
 
     days_names = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
-    t = get_thresholds()
 
     if use_color:
         # ANSI colors for direct terminal use
@@ -1102,10 +1449,10 @@ def show_heatmap(days=90, use_color=True):
         RESET = '\033[0m'
         BOLD = '\033[1m'
 
-        def tir_block(values):
-            if not values:
+        def tir_block(counts):
+            if not counts:
                 return ' '
-            tir = sum(1 for v in values if t["target_low"] <= v <= t["target_high"]) / len(values) * 100
+            tir = counts[0] / counts[1] * 100
             if tir >= 90:
                 return f'{GREEN}█{RESET}'
             if tir >= 80:
@@ -1124,7 +1471,7 @@ def show_heatmap(days=90, use_color=True):
         for d in range(7):
             row = ''
             for h in range(24):
-                row += tir_block(by_day_hour.get((d, h), [])) + ' '
+                row += tir_block(by_day_hour.get((d, h))) + ' '
             print(f'  {days_names[d]} │{row}│')
 
         print('      ' + '─' * 48)
@@ -1132,10 +1479,10 @@ def show_heatmap(days=90, use_color=True):
         print()
     else:
         # ASCII for Copilot/non-color terminals
-        def tir_block(values):
-            if not values:
+        def tir_block(counts):
+            if not counts:
                 return ' '
-            tir = sum(1 for v in values if t["target_low"] <= v <= t["target_high"]) / len(values) * 100
+            tir = counts[0] / counts[1] * 100
             if tir >= 90:
                 return '+'
             if tir >= 80:
@@ -1155,7 +1502,7 @@ def show_heatmap(days=90, use_color=True):
         for d in range(7):
             row = ''
             for h in range(24):
-                row += tir_block(by_day_hour.get((d, h), [])) + ' '
+                row += tir_block(by_day_hour.get((d, h))) + ' '
             print(f'  {days_names[d]} |{row}|')
 
         print('      ------------------------------------------------')
@@ -1165,9 +1512,9 @@ def show_heatmap(days=90, use_color=True):
         problems = []
         for d in range(7):
             for h in range(24):
-                vals = by_day_hour.get((d, h), [])
-                if vals:
-                    tir = sum(1 for v in vals if t["target_low"] <= v <= t["target_high"]) / len(vals) * 100
+                counts = by_day_hour.get((d, h))
+                if counts:
+                    tir = counts[0] / counts[1] * 100
                     if tir < 70:
                         problems.append((days_names[d], h, tir))
         
@@ -1189,24 +1536,23 @@ def show_day_chart(day_name, days=90, use_color=True):
         print(f"Invalid day: {day_name}")
         return
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = _read_conn()
     cutoff = datetime.now(timezone.utc) - timedelta(days=days)
     cutoff_ms = int(cutoff.timestamp() * 1000)
 
-    rows = conn.execute(
-        "SELECT sgv, date_string FROM readings WHERE date_ms >= ? AND sgv > 0",
-        (cutoff_ms,)
-    ).fetchall()
-    conn.close()
-
-    hourly = defaultdict(list)
-    for sgv, ds in rows:
-        try:
-            dt = datetime.fromisoformat(ds.replace("Z", "+00:00"))
-            if dt.weekday() == day_idx:
-                hourly[dt.hour].append(sgv)
-        except (ValueError, TypeError):
-            pass
+    # Per-hour sum and count for the chosen weekday, aggregated in SQLite
+    hourly = {
+        hour: (total, count)
+        for hour, total, count in conn.execute(
+            f"""
+            SELECT {_LOCAL_HOUR_SQL} AS hour, SUM(sgv), COUNT(*)
+            FROM readings
+            WHERE date_ms >= ? AND sgv > 0 AND {_LOCAL_WEEKDAY_SQL} = ?
+            GROUP BY hour
+            """,
+            (cutoff_ms, day_idx)
+        )
+    }
 
     t = get_thresholds()
 
@@ -1224,10 +1570,10 @@ def show_day_chart(day_name, days=90, use_color=True):
         print()
 
         for h in range(24):
-            values = hourly.get(h, [])
-            if not values:
+            if h not in hourly:
                 continue
-            avg = sum(values) / len(values)
+            total, count = hourly[h]
+            avg = total / count
             
             if avg < t["target_low"]:
                 color = RED
@@ -1254,10 +1600,10 @@ def show_day_chart(day_name, days=90, use_color=True):
         print()
 
         for h in range(24):
-            values = hourly.get(h, [])
-            if not values:
+            if h not in hourly:
                 continue
-            avg = sum(values) / len(values)
+            total, count = hourly[h]
+            avg = total / count
             
             bar_len = max(0, min(30, int((avg - 50) / 150 * 30)))
             bar = '#' * bar_len
@@ -1290,19 +1636,6 @@ def query_patterns(days=90, day_of_week=None, hour_start=None, hour_end=None):
     if not ensure_data(days):
         return {"error": "Could not fetch data from Nightscout. Check your NIGHTSCOUT_URL."}
 
-    conn = sqlite3.connect(DB_PATH)
-    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
-    cutoff_ms = int(cutoff.timestamp() * 1000)
-
-    rows = conn.execute(
-        "SELECT sgv, date_ms, date_string FROM readings WHERE date_ms >= ? AND sgv > 0 ORDER BY date_ms",
-        (cutoff_ms,)
-    ).fetchall()
-    conn.close()
-
-    if not rows:
-        return {"error": "No data found for the specified period."}
-
     # Parse day_of_week if it's a string name
     day_names = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
     if isinstance(day_of_week, str):
@@ -1310,28 +1643,35 @@ def query_patterns(days=90, day_of_week=None, hour_start=None, hour_end=None):
         if day_lower in day_names:
             day_of_week = day_names.index(day_lower)
 
-    # Filter readings
-    filtered = []
-    for sgv, date_ms, ds in rows:
-        try:
-            dt = datetime.fromisoformat(ds.replace("Z", "+00:00"))
-            
-            # Filter by day of week
-            if day_of_week is not None and dt.weekday() != day_of_week:
-                continue
-            
-            # Filter by hour range
-            if hour_start is not None and hour_end is not None:
-                if hour_start <= hour_end:
-                    if not (hour_start <= dt.hour < hour_end):
-                        continue
-                else:  # Handles overnight ranges like 22-6
-                    if not (dt.hour >= hour_start or dt.hour < hour_end):
-                        continue
-            
-            filtered.append((sgv, dt))
-        except (ValueError, TypeError):
-            pass
+    conn = _read_conn()
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    cutoff_ms = int(cutoff.timestamp() * 1000)
+
+    # Filter in SQL so only matching rows cross into Python
+    hour_sql = _LOCAL_HOUR_SQL
+    weekday_sql = _LOCAL_WEEKDAY_SQL
+    where = ["date_ms >= :cutoff_ms", "sgv > 0"]
+    params = {"cutoff_ms": cutoff_ms, "day_of_week": day_of_week,
+              "hour_start": hour_start, "hour_end": hour_end}
+    if day_of_week is not None:
+        where.append(f"{weekday_sql} = :day_of_week")
+    if hour_start is not None and hour_end is not None:
+        if hour_start <= hour_end:
+            where.append(f"{hour_sql} >= :hour_start AND {hour_sql} < :hour_end")
+        else:  # Handles overnight ranges like 22-6
+            where.append(f"({hour_sql} >= :hour_start OR {hour_sql} < :hour_end)")
+
+    filtered = conn.execute(
+        f"SELECT sgv, {hour_sql}, {weekday_sql} FROM readings "
+        f"WHERE {' AND '.join(where)} ORDER BY date_ms",
+        params
+    ).fetchall()
+    has_data = filtered or conn.execute(
+        "SELECT 1 FROM readings WHERE date_ms >= ? AND sgv > 0 LIMIT 1", (cutoff_ms,)
+    ).fetchone()
+
+    if not has_data:
+        return {"error": "No data found for the specified period."}
 
     if not filtered:
         return {"error": "No readings match the specified filters."}
@@ -1348,16 +1688,17 @@ def query_patterns(days=90, day_of_week=None, hour_start=None, hour_end=None):
         filter_desc.append(f"hours={hour_start:02d}:00-{hour_end:02d}:00")
 
     # Hourly breakdown within filtered data
+    convert = _glucose_converter()
     hourly = defaultdict(list)
-    for sgv, dt in filtered:
-        hourly[dt.hour].append(sgv)
-    hourly_avg = {h: convert_glucose(round(sum(v) / len(v), 0)) for h, v in sorted(hourly.items())}
+    for sgv, hour, _ in filtered:
+        hourly[hour].append(sgv)
+    hourly_avg = {h: convert(round(sum(v) / len(v), 0)) for h, v in sorted(hourly.items())}
 
     # Day of week breakdown
     daily = defaultdict(list)
-    for sgv, dt in filtered:
-        daily[day_names[dt.weekday()].capitalize()].append(sgv)
-    daily_avg = {d: convert_glucose(round(sum(v) / len(v), 0)) for d, v in daily.items()}
+    for sgv, _, weekday in filtered:
+        daily[day_names[weekday].capitalize()].append(sgv)
+    daily_avg = {d: convert(round(sum(v) / len(v), 0)) for d, v in daily.items()}
 
     return {
         "filter": " & ".join(filter_desc) if filter_desc else "none",
@@ -1371,6 +1712,124 @@ def query_patterns(days=90, day_of_week=None, hour_start=None, hour_end=None):
     }
 
 
+# Per-hour rollup of readings for the current thresholds, maintained
+# incrementally by fetch_and_store so find_patterns can aggregate ~24 rows/day
+# instead of ~288. Rows are keyed by UTC hour (for the cutoff) and wall-clock
+# hour (for the buckets); the two differ by a constant unless the offset isn't
+# whole hours. Statements run one at a time, inside the caller's transaction.
+_HOURLY_ROLLUP_SCHEMA = ("""
+CREATE TABLE IF NOT EXISTS readings_hourly (
+    hour_index INTEGER,  -- date_ms // MS_PER_HOUR
+    local_hour_index INTEGER,  -- (date_ms + utc_offset minutes) // MS_PER_HOUR
+    n INTEGER,
+    sum_sgv INTEGER,
+    n_in_range INTEGER,
+    n_low INTEGER,
+    first_ms INTEGER,
+    first_low_ms INTEGER,
+    PRIMARY KEY (hour_index, local_hour_index)
+)""", """
+CREATE TABLE IF NOT EXISTS readings_hourly_meta (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    max_rowid INTEGER,
+    n_readings INTEGER,
+    target_low INTEGER,
+    target_high INTEGER
+)""")
+
+_HOURLY_ROLLUP_META_SQL = (
+    "SELECT max_rowid, n_readings, target_low, target_high FROM readings_hourly_meta"
+)
+_READINGS_STATE_SQL = "SELECT MAX(rowid), COUNT(*) FROM readings"
+
+# Fold readings with watermark < rowid <= latest into their hours
+_HOURLY_ROLLUP_FOLD = """
+INSERT INTO readings_hourly
+SELECT date_ms / 3600000, (date_ms + utc_offset * 60000) / 3600000, COUNT(*), SUM(sgv),
+       SUM(sgv BETWEEN :target_low AND :target_high),
+       SUM(sgv < :target_low),
+       MIN(date_ms),
+       MIN(CASE WHEN sgv < :target_low THEN date_ms END)
+FROM readings
+WHERE rowid > :watermark AND rowid <= :latest
+  AND sgv > 0 AND date_ms IS NOT NULL
+GROUP BY 1, 2
+ON CONFLICT(hour_index, local_hour_index) DO UPDATE SET
+    n = n + excluded.n,
+    sum_sgv = sum_sgv + excluded.sum_sgv,
+    n_in_range = n_in_range + excluded.n_in_range,
+    n_low = n_low + excluded.n_low,
+    first_ms = MIN(first_ms, excluded.first_ms),
+    first_low_ms = COALESCE(
+        MIN(first_low_ms, excluded.first_low_ms), first_low_ms, excluded.first_low_ms
+    )
+"""
+
+
+def _update_hourly_rollup(conn, t):
+    """
+    Bring readings_hourly up to date with readings for thresholds t, inside the
+    caller's transaction.
+
+    The rollup is a derived cache kept in the database so find_patterns doesn't
+    regroup every reading on each run; deleting the two readings_hourly tables
+    is always safe. Rows past the recorded rowid watermark are folded in, then
+    the rollup's reading count is checked against readings, and any mismatch
+    (e.g. rowids renumbered by VACUUM) or threshold change rebuilds it.
+    """
+    for statement in _HOURLY_ROLLUP_SCHEMA:
+        conn.execute(statement)
+    meta = conn.execute(_HOURLY_ROLLUP_META_SQL).fetchone()
+    latest, total = conn.execute(_READINGS_STATE_SQL).fetchone()
+    latest = latest or 0
+    params = {**t, "latest": latest}
+    if meta and meta[2:] == (t["target_low"], t["target_high"]) and meta[0] <= latest:
+        conn.execute(_HOURLY_ROLLUP_FOLD, {**params, "watermark": meta[0]})
+        rolled_up = conn.execute("SELECT COALESCE(SUM(n), 0) FROM readings_hourly").fetchone()[0]
+        expected = conn.execute(
+            "SELECT COUNT(*) FROM readings WHERE sgv > 0 AND date_ms IS NOT NULL"
+        ).fetchone()[0]
+        stale = rolled_up != expected
+    else:
+        stale = True
+    if stale:
+        conn.execute("DELETE FROM readings_hourly")
+        conn.execute(_HOURLY_ROLLUP_FOLD, {**params, "watermark": -(2 ** 63)})
+    conn.execute(
+        "INSERT OR REPLACE INTO readings_hourly_meta VALUES (1, ?, ?, ?, ?)",
+        (latest, total, t["target_low"], t["target_high"])
+    )
+
+
+def _ensure_hourly_rollup(t):
+    """
+    True if readings_hourly can serve find_patterns for thresholds t.
+
+    fetch_and_store keeps the rollup current, so this is normally one read of
+    its metadata. Only when the thresholds or reading counts don't match (new
+    thresholds, rows written by something else) is it rebuilt here.
+    Returns False if it can't be maintained (e.g. the database is read-only).
+    """
+    try:
+        meta = _read_conn().execute(_HOURLY_ROLLUP_META_SQL).fetchone()
+        latest, total = _read_conn().execute(_READINGS_STATE_SQL).fetchone()
+        if meta == (latest or 0, total, t["target_low"], t["target_high"]):
+            return True
+    except sqlite3.OperationalError:
+        pass  # Rollup tables not created yet
+
+    try:
+        conn = _connect(DB_PATH)
+        try:
+            with conn:
+                _update_hourly_rollup(conn, t)
+        finally:
+            conn.close()
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
 def find_patterns(days=90):
     """
     Automatically find interesting patterns in the data.
@@ -1379,88 +1838,114 @@ def find_patterns(days=90):
     if not ensure_data(days):
         return {"error": "Could not fetch data from Nightscout. Check your NIGHTSCOUT_URL."}
 
-    conn = sqlite3.connect(DB_PATH)
+    conn = _read_conn()
     cutoff = datetime.now(timezone.utc) - timedelta(days=days)
     cutoff_ms = int(cutoff.timestamp() * 1000)
 
-    rows = conn.execute(
-        "SELECT sgv, date_ms, date_string FROM readings WHERE date_ms >= ? AND sgv > 0 ORDER BY date_ms",
-        (cutoff_ms,)
-    ).fetchall()
-    conn.close()
+    # Aggregate per (weekday, hour) in SQLite; hour and day totals roll up from
+    # these 168 rows. Groups come back in order of first reading so that ties
+    # in the max/min picks below resolve as they would scanning the readings.
+    t = get_thresholds()
+    params = {**t, "cutoff_ms": cutoff_ms, "first_full_hour": -(-cutoff_ms // MS_PER_HOUR)}
+    if _ensure_hourly_rollup(t):
+        # Whole hours from the rollup, plus the partial hour at the cutoff from readings
+        combos = conn.execute(
+            """
+            SELECT (local_hour_index / 24 + 3) % 7 AS weekday,
+                   local_hour_index % 24 AS hour,
+                   SUM(n), SUM(sum_sgv), SUM(n_in_range), SUM(n_low), MIN(first_low_ms)
+            FROM (
+                SELECT * FROM readings_hourly WHERE hour_index >= :first_full_hour
+                UNION ALL
+                SELECT date_ms / 3600000, (date_ms + utc_offset * 60000) / 3600000,
+                       COUNT(*), SUM(sgv),
+                       SUM(sgv BETWEEN :target_low AND :target_high),
+                       SUM(sgv < :target_low),
+                       MIN(date_ms),
+                       MIN(CASE WHEN sgv < :target_low THEN date_ms END)
+                FROM readings
+                WHERE date_ms >= :cutoff_ms AND date_ms < :first_full_hour * 3600000 AND sgv > 0
+                GROUP BY 1, 2
+            )
+            GROUP BY weekday, hour
+            ORDER BY MIN(first_ms)
+            """,
+            params
+        ).fetchall()
+    else:
+        combos = conn.execute(
+            f"""
+            SELECT {_LOCAL_WEEKDAY_SQL} AS weekday,
+                   {_LOCAL_HOUR_SQL} AS hour,
+                   COUNT(*), SUM(sgv),
+                   SUM(sgv BETWEEN :target_low AND :target_high),
+                   SUM(sgv < :target_low),
+                   MIN(CASE WHEN sgv < :target_low THEN date_ms END)
+            FROM readings
+            WHERE date_ms >= :cutoff_ms AND sgv > 0
+            GROUP BY weekday, hour
+            ORDER BY MIN(date_ms)
+            """,
+            params
+        ).fetchall()
 
-    if not rows:
+    if not combos:
         return {"error": "No data found for the specified period."}
 
     day_names = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-    
-    # Collect by hour and day
-    by_hour = defaultdict(list)
-    by_day = defaultdict(list)
-    by_day_hour = defaultdict(list)
-    
-    t = get_thresholds()
-    lows = []
-    highs = []
-    
-    for sgv, date_ms, ds in rows:
-        try:
-            dt = datetime.fromisoformat(ds.replace("Z", "+00:00"))
-            by_hour[dt.hour].append(sgv)
-            by_day[dt.weekday()].append(sgv)
-            by_day_hour[(dt.weekday(), dt.hour)].append(sgv)
-            
-            if sgv < t["target_low"]:
-                lows.append((sgv, dt))
-            elif sgv > t["target_high"]:
-                highs.append((sgv, dt))
-        except (ValueError, TypeError):
-            pass
+
+    # Roll up [count, sum, in_range] by hour and by day
+    by_hour = {}
+    by_day = {}
+    combo_tir = {}
+    for d, h, count, total, in_range, _, _ in combos:
+        for bins, key in ((by_hour, h), (by_day, d)):
+            agg = bins.setdefault(key, [0, 0, 0])
+            agg[0] += count
+            agg[1] += total
+            agg[2] += in_range
+        if count >= 10:  # Need enough data
+            combo_tir[(d, h)] = in_range / count * 100
 
     # Find best/worst hours
-    hour_avgs = {h: sum(v)/len(v) for h, v in by_hour.items()}
-    hour_tir = {h: sum(1 for x in v if t["target_low"] <= x <= t["target_high"])/len(v)*100 
-                for h, v in by_hour.items()}
+    hour_avgs = {h: total / count for h, (count, total, _) in by_hour.items()}
+    hour_tir = {h: in_range / count * 100 for h, (count, _, in_range) in by_hour.items()}
     
     best_hour = max(hour_tir, key=hour_tir.get)
     worst_hour = min(hour_tir, key=hour_tir.get)
     
     # Find best/worst days
-    day_avgs = {d: sum(v)/len(v) for d, v in by_day.items()}
-    day_tir = {d: sum(1 for x in v if t["target_low"] <= x <= t["target_high"])/len(v)*100 
-               for d, v in by_day.items()}
+    day_avgs = {d: total / count for d, (count, total, _) in by_day.items()}
+    day_tir = {d: in_range / count * 100 for d, (count, _, in_range) in by_day.items()}
     
     best_day = max(day_tir, key=day_tir.get)
     worst_day = min(day_tir, key=day_tir.get)
     
     # Find problematic day+hour combinations
-    combo_tir = {}
-    for (d, h), values in by_day_hour.items():
-        if len(values) >= 10:  # Need enough data
-            tir_pct = sum(1 for x in values if t["target_low"] <= x <= t["target_high"])/len(values)*100
-            combo_tir[(d, h)] = tir_pct
+    # Top 3 from up to 168 combos without sorting them all (ties keep first-seen order)
+    worst_combos = nsmallest(3, combo_tir.items(), key=lambda x: x[1])
+    best_combos = nlargest(3, combo_tir.items(), key=lambda x: x[1])
     
-    worst_combos = sorted(combo_tir.items(), key=lambda x: x[1])[:3]
-    best_combos = sorted(combo_tir.items(), key=lambda x: x[1], reverse=True)[:3]
-    
-    # Low patterns
+    # Low patterns, in order of first low
     low_hours = defaultdict(int)
     low_days = defaultdict(int)
-    for sgv, dt in lows:
-        low_hours[dt.hour] += 1
-        low_days[dt.weekday()] += 1
+    low_combos = sorted((c for c in combos if c[5]), key=lambda c: c[6])
+    for d, h, _, _, _, lows, _ in low_combos:
+        low_hours[h] += lows
+        low_days[d] += lows
+    total_lows = sum(low_hours.values())
     
     return {
         "days_analyzed": days,
-        "total_readings": len(rows),
+        "total_readings": sum(count for count, _, _ in by_hour.values()),
         "insights": {
             "best_time_of_day": {
-                "hour": f"{best_hour:02d}:00",
+                "hour": HOUR_LABELS[best_hour],
                 "time_in_range": round(hour_tir[best_hour], 1),
                 "avg_glucose": convert_glucose(round(hour_avgs[best_hour], 0))
             },
             "worst_time_of_day": {
-                "hour": f"{worst_hour:02d}:00",
+                "hour": HOUR_LABELS[worst_hour],
                 "time_in_range": round(hour_tir[worst_hour], 1),
                 "avg_glucose": convert_glucose(round(hour_avgs[worst_hour], 0))
             },
@@ -1476,19 +1961,19 @@ def find_patterns(days=90):
             },
             "problem_times": [
                 {
-                    "when": f"{day_names[d]} {h:02d}:00",
+                    "when": f"{day_names[d]} {HOUR_LABELS[h]}",
                     "time_in_range": round(tir, 1)
                 } for (d, h), tir in worst_combos
             ],
             "best_times": [
                 {
-                    "when": f"{day_names[d]} {h:02d}:00",
+                    "when": f"{day_names[d]} {HOUR_LABELS[h]}",
                     "time_in_range": round(tir, 1)
                 } for (d, h), tir in best_combos
             ],
             "low_events": {
-                "total": len(lows),
-                "most_common_hour": f"{max(low_hours, key=low_hours.get):02d}:00" if low_hours else "N/A",
+                "total": total_lows,
+                "most_common_hour": HOUR_LABELS[max(low_hours, key=low_hours.get)] if low_hours else "N/A",
                 "most_common_day": day_names[max(low_days, key=low_days.get)] if low_days else "N/A"
             }
         },
@@ -1511,17 +1996,18 @@ def detect_trend_alerts(days=90, min_occurrences=2):
     if not ensure_data(days):
         return {"error": "Could not fetch data from Nightscout. Check your NIGHTSCOUT_URL."}
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = _read_conn()
     cutoff = datetime.now(timezone.utc) - timedelta(days=days)
     cutoff_ms = int(cutoff.timestamp() * 1000)
     
+    # Stream rows from the cursor rather than materializing the whole window
     rows = conn.execute(
-        "SELECT sgv, date_ms, date_string FROM readings WHERE date_ms >= ? AND sgv > 0 ORDER BY date_ms",
+        "SELECT sgv, date_string FROM readings WHERE date_ms >= ? AND sgv > 0 ORDER BY date_ms",
         (cutoff_ms,)
-    ).fetchall()
-    conn.close()
+    )
+    first = rows.fetchone()
     
-    if not rows:
+    if first is None:
         return {"error": "No data found for the specified period."}
     
     t = get_thresholds()
@@ -1540,9 +2026,9 @@ def detect_trend_alerts(days=90, min_occurrences=2):
     highs_by_week = defaultdict(int)
     tir_by_week = defaultdict(lambda: {"in_range": 0, "total": 0})
     
-    for sgv, date_ms, ds in rows:
+    for sgv, ds in chain((first,), rows):
         try:
-            dt = datetime.fromisoformat(ds.replace("Z", "+00:00"))
+            dt = _parse_ns_datetime(ds)
             week_num = dt.isocalendar()[1]
             
             # Track time in range by week for trend analysis
@@ -1755,21 +2241,29 @@ def detect_trend_alerts(days=90, min_occurrences=2):
     }
 
 
+_ISO_DATE_RE = re.compile(r"\d{4}-\d{1,2}-\d{1,2}")
+
+
 def parse_date_arg(date_str):
     """Parse a date argument like 'today', 'yesterday', '2026-01-16', or 'Jan 16'."""
-    date_str = date_str.lower().strip()
-    today = datetime.now().date()
-    
+    # Results depend on the current date ('today', yearless dates), so it is part of the cache key
+    return _parse_date_on(date_str.lower().strip(), datetime.now().date())
+
+
+@lru_cache(maxsize=256)
+def _parse_date_on(date_str, today):
+    """parse_date_arg for a normalized string, relative to the given current date."""
     if date_str == "today":
         return today
     elif date_str == "yesterday":
         return today - timedelta(days=1)
     
-    # Try ISO format (2026-01-16)
-    try:
-        return datetime.strptime(date_str, "%Y-%m-%d").date()
-    except ValueError:
-        pass
+    # Try ISO format (2026-01-16); the precheck skips a raising strptime for short formats
+    if _ISO_DATE_RE.fullmatch(date_str):
+        try:
+            return datetime.strptime(date_str, "%Y-%m-%d").date()
+        except ValueError:
+            pass
     
     # Try short formats (Jan 16, January 16)
     for fmt in ["%b %d", "%B %d", "%m/%d", "%m-%d"]:
@@ -1783,6 +2277,16 @@ def parse_date_arg(date_str):
     raise ValueError(f"Could not parse date: {date_str}. Try 'today', 'yesterday', '2026-01-16', or 'Jan 16'")
 
 
+def _local_day_range_ms(day):
+    """
+    Return (start_ms, end_ms) spanning the local calendar day, end exclusive.
+    Lets date filters use a date_ms index range instead of converting every row.
+    """
+    start = datetime(day.year, day.month, day.day).astimezone()
+    end = (datetime(day.year, day.month, day.day) + timedelta(days=1)).astimezone()
+    return int(start.timestamp() * 1000), int(end.timestamp() * 1000)
+
+
 def view_day(date_str, hour_start=None, hour_end=None):
     """
     View all glucose readings for a specific date.
@@ -1796,15 +2300,16 @@ def view_day(date_str, hour_start=None, hour_end=None):
     except ValueError as e:
         return {"error": str(e)}
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = _read_conn()
     
     # Build query for the specific date
+    # Local HH:MM comes straight from SQLite rather than parsing date_string per row
     query = """
-    SELECT sgv, date_ms, date_string, direction
+    SELECT sgv, strftime('%H:%M', date_ms / 1000, 'unixepoch', 'localtime'), direction
     FROM readings
-    WHERE date(datetime(date_ms/1000, 'unixepoch', 'localtime')) = ?
+    WHERE date_ms >= ? AND date_ms < ?
     """
-    params = [target_date.isoformat()]
+    params = list(_local_day_range_ms(target_date))
     
     # Add hour filter if specified
     if hour_start is not None and hour_end is not None:
@@ -1815,45 +2320,28 @@ def view_day(date_str, hour_start=None, hour_end=None):
     query += " ORDER BY date_ms"
     
     rows = conn.execute(query, params).fetchall()
-    conn.close()
     
     if not rows:
         return {"error": f"No readings found for {target_date.isoformat()}"}
     
-    t = get_thresholds()
-    readings = []
-    sgv_values = []
-    
-    for sgv, date_ms, date_string, direction in rows:
-        try:
-            dt = datetime.fromisoformat(date_string.replace("Z", "+00:00"))
-            local_time = dt.astimezone().strftime("%H:%M")
-        except (ValueError, TypeError):
-            local_time = "??:??"
-        
-        status = "in_range"
-        if sgv < t["urgent_low"]:
-            status = "very_low"
-        elif sgv < t["target_low"]:
-            status = "low"
-        elif sgv > t["urgent_high"]:
-            status = "very_high"
-        elif sgv > t["target_high"]:
-            status = "high"
-        
-        readings.append({
-            "time": local_time,
-            "glucose": convert_glucose(sgv),
-            "trend": direction or "Unknown",
-            "status": status
-        })
-        sgv_values.append(sgv)
-    
-    # Calculate statistics
+    # Work column-wise: classify and convert each distinct sgv once (a day's
+    # readings repeat heavily), then zip the columns into reading dicts
+    status_of = _GlyphCache(_status_classifier(READING_STATUS_LABELS))
+    convert = _glucose_converter()
+    glucose_of = _GlyphCache(convert)
+    sgv_values, times, directions = zip(*rows)
+    statuses = list(map(status_of.__getitem__, sgv_values))
+    readings = [
+        {"time": local_time, "glucose": glucose, "trend": direction or "Unknown", "status": status}
+        for local_time, glucose, direction, status
+        in zip(times, map(glucose_of.__getitem__, sgv_values), directions, statuses)
+    ]
+    in_range = statuses.count("in_range")
+    
+    # Calculate statistics (sum/min/max/index are single C-level passes)
     avg_sgv = sum(sgv_values) / len(sgv_values)
     min_sgv = min(sgv_values)
     max_sgv = max(sgv_values)
-    in_range = sum(1 for v in sgv_values if t["target_low"] <= v <= t["target_high"])
     tir_pct = (in_range / len(sgv_values)) * 100
     
     # Find peak and trough times
@@ -1869,9 +2357,9 @@ def view_day(date_str, hour_start=None, hour_end=None):
         "filter": time_filter,
         "readings_count": len(readings),
         "statistics": {
-            "average": convert_glucose(round(avg_sgv)),
-            "min": convert_glucose(min_sgv),
-            "max": convert_glucose(max_sgv),
+            "average": convert(round(avg_sgv)),
+            "min": convert(min_sgv),
+            "max": convert(max_sgv),
             "time_in_range_pct": round(tir_pct, 1),
             "peak_time": readings[peak_idx]["time"],
             "trough_time": readings[trough_idx]["time"]
@@ -1881,15 +2369,15 @@ def view_day(date_str, hour_start=None, hour_end=None):
     }
 
 
-def find_worst_days(days=21, hour_start=None, hour_end=None, limit=5):
+def find_worst_days(days=21, hour_start=None, hour_end=None, limit=5, by_tir=False):
     """
     Find the worst days for glucose control in a given period.
-    Ranks days by peak glucose and time out of range.
+    Ranks days by peak glucose, or by share of readings out of range if by_tir.
     """
     if not ensure_data(days):
         return {"error": "Could not fetch data from Nightscout. Check your NIGHTSCOUT_URL."}
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = _read_conn()
     cutoff = datetime.now(timezone.utc) - timedelta(days=days)
     cutoff_ms = int(cutoff.timestamp() * 1000)
     
@@ -1915,10 +2403,14 @@ def find_worst_days(days=21, hour_start=None, hour_end=None, limit=5):
                      BETWEEN ? AND ?"""
         params.extend([hour_start, hour_end])
     
-    query += " GROUP BY day ORDER BY peak DESC"
+    # Let SQLite keep only the top rows instead of returning every day
+    if by_tir:
+        query += " GROUP BY day ORDER BY in_range_count * 1.0 / readings, peak DESC LIMIT ?"
+    else:
+        query += " GROUP BY day ORDER BY peak DESC LIMIT ?"
+    params.append(max(limit, 1))
     
     rows = conn.execute(query, params).fetchall()
-    conn.close()
     
     if not rows:
         return {"error": "No data found for the specified period."}
@@ -1968,13 +2460,12 @@ def generate_html_report(days=90, output_path=None):
     if not ensure_fresh_data(days):
         return {"error": "Could not fetch data from Nightscout. Check your NIGHTSCOUT_URL."}
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = _read_conn()
     
     # Fetch ALL readings for interactive filtering in the browser
     all_rows = conn.execute(
         "SELECT sgv, date_ms, date_string, direction FROM readings WHERE sgv > 0 ORDER BY date_ms"
     ).fetchall()
-    conn.close()
     
     if not all_rows:
         return {"error": "No data found."}
@@ -1997,6 +2488,7 @@ def generate_html_report(days=90, output_path=None):
         })
     
     t = get_thresholds()
+    convert = _glucose_converter()
     unit = get_unit_label()
     is_mmol = use_mmol()
     
@@ -2006,17 +2498,12 @@ def generate_html_report(days=90, output_path=None):
     
     # Basic statistics
     all_values = [r[0] for r in rows]
-    raw_mean = sum(all_values) / len(all_values)
-    raw_std = (sum((x - raw_mean) ** 2 for x in all_values) / len(all_values)) ** 0.5
+    _, raw_mean, raw_std = _raw_stats(all_values)
     gmi = round(3.31 + (0.02392 * raw_mean), 1)
     cv = round((raw_std / raw_mean) * 100, 1) if raw_mean else 0
     
     # Time in range calculation
-    very_low = sum(1 for v in all_values if v < t["urgent_low"])
-    low = sum(1 for v in all_values if t["urgent_low"] <= v < t["target_low"])
-    in_range = sum(1 for v in all_values if t["target_low"] <= v <= t["target_high"])
-    high = sum(1 for v in all_values if t["target_high"] < v <= t["urgent_high"])
-    very_high = sum(1 for v in all_values if v > t["urgent_high"])
+    very_low, low, in_range, high, very_high = _tir_counts(all_values, t)
     total = len(all_values)
     
     tir_data = {
@@ -2031,7 +2518,7 @@ def generate_html_report(days=90, output_path=None):
     hourly_all = defaultdict(list)
     for sgv, _, ds, _ in rows:
         try:
-            dt = datetime.fromisoformat(ds.replace("Z", "+00:00"))
+            dt = _parse_ns_datetime(ds)
             hourly_all[dt.hour].append(sgv)
         except (ValueError, TypeError):
             pass
@@ -2044,14 +2531,14 @@ def generate_html_report(days=90, output_path=None):
             n = len(sorted_vals)
             modal_day_data.append({
                 "hour": hour,
-                "mean": convert_glucose(round(sum(values) / n, 1)),
-                "median": convert_glucose(sorted_vals[n // 2]),
-                "p10": convert_glucose(sorted_vals[int(n * 0.1)]) if n > 10 else convert_glucose(sorted_vals[0]),
-                "p25": convert_glucose(sorted_vals[int(n * 0.25)]) if n > 4 else convert_glucose(sorted_vals[0]),
-                "p75": convert_glucose(sorted_vals[int(n * 0.75)]) if n > 4 else convert_glucose(sorted_vals[-1]),
-                "p90": convert_glucose(sorted_vals[int(n * 0.9)]) if n > 10 else convert_glucose(sorted_vals[-1]),
-                "min": convert_glucose(sorted_vals[0]),
-                "max": convert_glucose(sorted_vals[-1])
+                "mean": convert(round(sum(values) / n, 1)),
+                "median": convert(sorted_vals[n // 2]),
+                "p10": convert(sorted_vals[int(n * 0.1)]) if n > 10 else convert(sorted_vals[0]),
+                "p25": convert(sorted_vals[int(n * 0.25)]) if n > 4 else convert(sorted_vals[0]),
+                "p75": convert(sorted_vals[int(n * 0.75)]) if n > 4 else convert(sorted_vals[-1]),
+                "p90": convert(sorted_vals[int(n * 0.9)]) if n > 10 else convert(sorted_vals[-1]),
+                "min": convert(sorted_vals[0]),
+                "max": convert(sorted_vals[-1])
             })
         else:
             modal_day_data.append({
@@ -2064,7 +2551,7 @@ def generate_html_report(days=90, output_path=None):
     daily_data = defaultdict(list)
     for sgv, _, ds, _ in rows:
         try:
-            dt = datetime.fromisoformat(ds.replace("Z", "+00:00"))
+            dt = _parse_ns_datetime(ds)
             date_key = dt.strftime("%Y-%m-%d")
             daily_data[date_key].append(sgv)
         except (ValueError, TypeError):
@@ -2077,9 +2564,9 @@ def generate_html_report(days=90, output_path=None):
             in_r = sum(1 for v in values if t["target_low"] <= v <= t["target_high"])
             daily_stats.append({
                 "date": date_str,
-                "mean": convert_glucose(round(sum(values) / len(values), 1)),
-                "min": convert_glucose(min(values)),
-                "max": convert_glucose(max(values)),
+                "mean": convert(round(sum(values) / len(values), 1)),
+                "min": convert(min(values)),
+                "max": convert(max(values)),
                 "tir": round(in_r / len(values) * 100, 1),
                 "readings": len(values)
             })
@@ -2089,7 +2576,7 @@ def generate_html_report(days=90, output_path=None):
     dow_data = defaultdict(list)
     for sgv, _, ds, _ in rows:
         try:
-            dt = datetime.fromisoformat(ds.replace("Z", "+00:00"))
+            dt = _parse_ns_datetime(ds)
             dow_data[dt.weekday()].append(sgv)
         except (ValueError, TypeError):
             pass
@@ -2101,7 +2588,7 @@ def generate_html_report(days=90, output_path=None):
             in_r = sum(1 for v in values if t["target_low"] <= v <= t["target_high"])
             dow_stats.append({
                 "day": day_names[day_idx],
-                "mean": convert_glucose(round(sum(values) / len(values), 1)),
+                "mean": convert(round(sum(values) / len(values), 1)),
                 "tir": round(in_r / len(values) * 100, 1),
                 "readings": len(values)
             })
@@ -2117,7 +2604,7 @@ def generate_html_report(days=90, output_path=None):
     heatmap_data = defaultdict(lambda: defaultdict(list))
     for sgv, _, ds, _ in rows:
         try:
-            dt = datetime.fromisoformat(ds.replace("Z", "+00:00"))
+            dt = _parse_ns_datetime(ds)
             heatmap_data[dt.weekday()][dt.hour].append(sgv)
         except (ValueError, TypeError):
             pass
@@ -2149,7 +2636,7 @@ def generate_html_report(days=90, output_path=None):
     histogram_data = []
     for b in range(min_bin, max_bin + bin_size, bin_size):
         histogram_data.append({
-            "bin": convert_glucose(b) if is_mmol else b,
+            "bin": convert(b) if is_mmol else b,
             "count": bins.get(b, 0)
         })
     
@@ -2157,7 +2644,7 @@ def generate_html_report(days=90, output_path=None):
     weekly_data = defaultdict(list)
     for sgv, _, ds, _ in rows:
         try:
-            dt = datetime.fromisoformat(ds.replace("Z", "+00:00"))
+            dt = _parse_ns_datetime(ds)
             week_start = (dt - timedelta(days=dt.weekday())).strftime("%Y-%m-%d")
             weekly_data[week_start].append(sgv)
         except (ValueError, TypeError):
@@ -2170,7 +2657,7 @@ def generate_html_report(days=90, output_path=None):
             in_r = sum(1 for v in values if t["target_low"] <= v <= t["target_high"])
             weekly_stats.append({
                 "week": week_start,
-                "mean": convert_glucose(round(sum(values) / len(values), 1)),
+                "mean": convert(round(sum(values) / len(values), 1)),
                 "tir": round(in_r / len(values) * 100, 1),
                 "readings": len(values)
             })
@@ -2221,7 +2708,7 @@ def generate_html_report(days=90, output_path=None):
         for b in treatments_data["boluses"]:
             try:
                 ts = b.get("timestamp", "")
-                dt = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+                dt = _parse_ns_datetime(ts)
                 bolus_markers.append({
                     "date": ts,
                     "hour": dt.hour + dt.minute / 60,
@@ -2237,7 +2724,7 @@ def generate_html_report(days=90, output_path=None):
         for c in treatments_data["carbs"]:
             try:
                 ts = c.get("timestamp", "")
-                dt = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+                dt = _parse_ns_datetime(ts)
                 carb_markers.append({
                     "date": ts,
                     "hour": dt.hour + dt.minute / 60,
@@ -4898,13 +5385,13 @@ def generate_html_report(days=90, output_path=None):
         "gmi": gmi,
         "cv": cv,
         "cv_status": "stable" if cv < 36 else "variable",
-        "mean": convert_glucose(round(raw_mean, 1)),
-        "urgent_low": convert_glucose(t["urgent_low"]),
-        "target_low": convert_glucose(t["target_low"]),
-        "target_low_minus": convert_glucose(t["target_low"] - 1),
-        "target_high": convert_glucose(t["target_high"]),
-        "target_high_plus": convert_glucose(t["target_high"] + 1),
-        "urgent_high": convert_glucose(t["urgent_high"]),
+        "mean": convert(round(raw_mean, 1)),
+        "urgent_low": convert(t["urgent_low"]),
+        "target_low": convert(t["target_low"]),
+        "target_low_minus": convert(t["target_low"] - 1),
+        "target_high": convert(t["target_high"]),
+        "target_high_plus": convert(t["target_high"] + 1),
+        "urgent_high": convert(t["urgent_high"]),
         "modal_day_json": json.dumps(modal_day_data),
         "daily_stats_json": json.dumps(daily_stats),
         "dow_stats_json": json.dumps(dow_stats),
@@ -4966,7 +5453,7 @@ def generate_agp_report(days=14, output_path=None):
     if not ensure_fresh_data(days):
         return {"error": "Could not fetch data from Nightscout. Check your NIGHTSCOUT_URL."}
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = _read_conn()
     
     # Fetch readings for the specified period
     cutoff = datetime.now(timezone.utc) - timedelta(days=days)
@@ -4976,12 +5463,12 @@ def generate_agp_report(days=14, output_path=None):
         "SELECT sgv, date_ms, date_string, direction FROM readings WHERE sgv > 0 AND date_ms >= ? ORDER BY date_ms",
         (cutoff_ms,)
     ).fetchall()
-    conn.close()
     
     if not rows:
         return {"error": "No data found for the specified period."}
     
     t = get_thresholds()
+    convert = _glucose_converter()
     unit = get_unit_label()
     is_mmol = use_mmol()
     
@@ -4992,17 +5479,12 @@ def generate_agp_report(days=14, output_path=None):
     all_values = [r[0] for r in rows]
     
     # Basic statistics
-    raw_mean = sum(all_values) / len(all_values)
-    raw_std = (sum((x - raw_mean) ** 2 for x in all_values) / len(all_values)) ** 0.5
+    _, raw_mean, raw_std = _raw_stats(all_values)
     gmi = round(3.31 + (0.02392 * raw_mean), 1)
     cv = round((raw_std / raw_mean) * 100, 1) if raw_mean else 0
     
     # Time in range calculation (AGP standard)
-    very_low = sum(1 for v in all_values if v < t["urgent_low"])
-    low = sum(1 for v in all_values if t["urgent_low"] <= v < t["target_low"])
-    in_range = sum(1 for v in all_values if t["target_low"] <= v <= t["target_high"])
-    high = sum(1 for v in all_values if t["target_high"] < v <= t["urgent_high"])
-    very_high = sum(1 for v in all_values if v > t["urgent_high"])
+    very_low, low, in_range, high, very_high = _tir_counts(all_values, t)
     total = len(all_values)
     
     tir_data = {
@@ -5017,7 +5499,7 @@ def generate_agp_report(days=14, output_path=None):
     hourly_all = defaultdict(list)
     for sgv, _, ds, _ in rows:
         try:
-            dt = datetime.fromisoformat(ds.replace("Z", "+00:00"))
+            dt = _parse_ns_datetime(ds)
             hourly_all[dt.hour].append(sgv)
         except (ValueError, TypeError):
             pass
@@ -5029,7 +5511,7 @@ def generate_agp_report(days=14, output_path=None):
         if n == 0:
             return None
         index = min(n - 1, max(0, int(n * percentile)))
-        return convert_glucose(sorted_values[index])
+        return convert(sorted_values[index])
     
     agp_modal_day = []
     for hour in range(24):
@@ -5053,7 +5535,7 @@ def generate_agp_report(days=14, output_path=None):
     daily_profiles = defaultdict(lambda: defaultdict(list))
     for sgv, _, ds, _ in rows:
         try:
-            dt = datetime.fromisoformat(ds.replace("Z", "+00:00"))
+            dt = _parse_ns_datetime(ds)
             date_key = dt.strftime("%Y-%m-%d")
             daily_profiles[date_key][dt.hour].append(sgv)
         except (ValueError, TypeError):
@@ -5071,7 +5553,7 @@ def generate_agp_report(days=14, output_path=None):
             if values:
                 hourly_data.append({
                     "hour": hour,
-                    "mean": convert_glucose(round(sum(values) / len(values), 1)),
+                    "mean": convert(round(sum(values) / len(values), 1)),
                     "count": len(values)
                 })
             else:
@@ -5090,7 +5572,7 @@ def generate_agp_report(days=14, output_path=None):
     for r in rows:
         if r[2]:  # if date_string exists
             try:
-                dt = datetime.fromisoformat(r[2].replace("Z", "+00:00"))
+                dt = _parse_ns_datetime(r[2])
                 unique_date_strings.add(dt.strftime("%Y-%m-%d"))
             except (ValueError, TypeError):
                 pass
@@ -5337,7 +5819,7 @@ def generate_agp_report(days=14, output_path=None):
             <div class="stats-grid">
                 <div class="stat-card">
                     <div class="stat-label">Average Glucose</div>
-                    <div class="stat-value">''' + str(convert_glucose(round(raw_mean, 1))) + '''<span class="stat-unit">''' + unit + '''</span></div>
+                    <div class="stat-value">''' + str(convert(round(raw_mean, 1))) + '''<span class="stat-unit">''' + unit + '''</span></div>
                 </div>
                 <div class="stat-card">
                     <div class="stat-label">GMI (estimated A1C)</div>
@@ -5377,23 +5859,23 @@ def generate_agp_report(days=14, output_path=None):
             <div class="tir-legend">
                 <div class="tir-legend-item">
                     <div class="tir-legend-color tir-very-low"></div>
-                    <span>Very Low (&lt;''' + str(convert_glucose(t["urgent_low"])) + '''): ''' + str(tir_data["very_low"]) + '''%</span>
+                    <span>Very Low (&lt;''' + str(convert(t["urgent_low"])) + '''): ''' + str(tir_data["very_low"]) + '''%</span>
                 </div>
                 <div class="tir-legend-item">
                     <div class="tir-legend-color tir-low"></div>
-                    <span>Low (''' + str(convert_glucose(t["urgent_low"])) + '''-''' + str(convert_glucose(t["target_low"])) + '''): ''' + str(tir_data["low"]) + '''%</span>
+                    <span>Low (''' + str(convert(t["urgent_low"])) + '''-''' + str(convert(t["target_low"])) + '''): ''' + str(tir_data["low"]) + '''%</span>
                 </div>
                 <div class="tir-legend-item">
                     <div class="tir-legend-color tir-in-range"></div>
-                    <span>In Range (''' + str(convert_glucose(t["target_low"])) + '''-''' + str(convert_glucose(t["target_high"])) + '''): ''' + str(tir_data["in_range"]) + '''%</span>
+                    <span>In Range (''' + str(convert(t["target_low"])) + '''-''' + str(convert(t["target_high"])) + '''): ''' + str(tir_data["in_range"]) + '''%</span>
                 </div>
                 <div class="tir-legend-item">
                     <div class="tir-legend-color tir-high"></div>
-                    <span>High (''' + str(convert_glucose(t["target_high"])) + '''-''' + str(convert_glucose(t["urgent_high"])) + '''): ''' + str(tir_data["high"]) + '''%</span>
+                    <span>High (''' + str(convert(t["target_high"])) + '''-''' + str(convert(t["urgent_high"])) + '''): ''' + str(tir_data["high"]) + '''%</span>
                 </div>
                 <div class="tir-legend-item">
                     <div class="tir-legend-color tir-very-high"></div>
-                    <span>Very High (&gt;''' + str(convert_glucose(t["urgent_high"])) + '''): ''' + str(tir_data["very_high"]) + '''%</span>
+                    <span>Very High (&gt;''' + str(convert(t["urgent_high"])) + '''): ''' + str(tir_data["very_high"]) + '''%</span>
                 </div>
             </div>
         </div>
@@ -5402,7 +5884,7 @@ def generate_agp_report(days=14, output_path=None):
         <div class="agp-section">
             <div class="section-title">Ambulatory Glucose Profile</div>
             <div class="agp-targets">
-                <strong>Target Range:</strong> ''' + str(convert_glucose(t["target_low"])) + '''-''' + str(convert_glucose(t["target_high"])) + ''' ''' + unit + ''' | 
+                <strong>Target Range:</strong> ''' + str(convert(t["target_low"])) + '''-''' + str(convert(t["target_high"])) + ''' ''' + unit + ''' | 
                 <strong>AGP Goal:</strong> Time in Range &gt;70%, Time Below &lt;4%, CV &lt;36%
             </div>
             <div class="chart-container">
@@ -5419,10 +5901,10 @@ def generate_agp_report(days=14, output_path=None):
     
     <script>
         const unit = "''' + unit + '''";
-        const targetLow = ''' + str(convert_glucose(t["target_low"])) + ''';
-        const targetHigh = ''' + str(convert_glucose(t["target_high"])) + ''';
-        const urgentLow = ''' + str(convert_glucose(t["urgent_low"])) + ''';
-        const urgentHigh = ''' + str(convert_glucose(t["urgent_high"])) + ''';
+        const targetLow = ''' + str(convert(t["target_low"])) + ''';
+        const targetHigh = ''' + str(convert(t["target_high"])) + ''';
+        const urgentLow = ''' + str(convert(t["urgent_low"])) + ''';
+        const urgentHigh = ''' + str(convert(t["urgent_high"])) + ''';
         
         // AGP Modal Day Data
         const agpData = ''' + json.dumps(agp_modal_day) + ''';
@@ -5620,7 +6102,7 @@ def get_pump_status():
     
     try:
         # Get latest device status
-        resp = requests.get(f"{API_ROOT}/devicestatus.json", params={"count": 1}, timeout=10)
+        resp = SESSION.get(f"{API_ROOT}/devicestatus.json", params={"count": 1}, timeout=10)
         resp.raise_for_status()
         statuses = resp.json()
         
@@ -5745,7 +6227,7 @@ def get_treatments(hours=24, event_types=None, limit=20):
         cutoff = datetime.now(timezone.utc) - timedelta(hours=hours)
         cutoff_str = cutoff.strftime("%Y-%m-%dT%H:%M:%SZ")
         
-        resp = requests.get(
+        resp = SESSION.get(
             f"{API_ROOT}/treatments.json",
             params={"count": 5000, "find[created_at][$gte]": cutoff_str},
             timeout=30
@@ -5836,7 +6318,7 @@ def get_profile():
         }
     
     try:
-        resp = requests.get(f"{API_ROOT}/profile.json", timeout=10)
+        resp = SESSION.get(f"{API_ROOT}/profile.json", timeout=10)
         resp.raise_for_status()
         profiles = resp.json()
         
@@ -5957,6 +6439,109 @@ def get_profile():
         return {"error": f"Failed to fetch profile: {e}"}
 
 
+def _run_query(args):
+    """Run the 'query' command; --day may be a weekday name or 0-6."""
+    day = args.day
+    if day and day.isdigit():
+        day = int(day)
+    return query_patterns(
+        days=args.days,
+        day_of_week=day,
+        hour_start=args.hour_start,
+        hour_end=args.hour_end
+    )
+
+
+def _run_chart(args):
+    """Run the 'chart' command. Charts print directly, so this exits instead of returning JSON."""
+    use_color = args.color
+    if args.week:
+        show_sparkline_week(args.days, use_color=use_color)
+    elif args.sparkline or args.date:
+        show_sparkline(
+            hours=args.hours,
+            use_color=use_color,
+            date_str=args.date,
+            hour_start=args.hour_start,
+            hour_end=args.hour_end
+        )
+    elif args.heatmap:
+        show_heatmap(args.days, use_color=use_color)
+    elif args.day:
+        show_day_chart(args.day, args.days, use_color=use_color)
+    else:
+        show_heatmap(args.days, use_color=use_color)  # Default to heatmap
+    sys.exit(0)
+
+
+def _run_report(args):
+    """Run the 'report' command and print where the HTML report was written."""
+    result = generate_html_report(
+        days=args.days,
+        output_path=args.output
+    )
+    if "error" not in result:
+        print(f"Report generated: {result['report']}")
+        print(f"  Period: {result['date_range']}")
+        print(f"  Readings: {result['readings']}")
+        
+        # Open in browser if requested
+        if args.open:
+            import webbrowser
+            webbrowser.open(f"file://{result['report']}")
+    return result
+
+
+def _run_agp(args):
+    """Run the 'agp' command and print where the AGP report was written."""
+    result = generate_agp_report(
+        days=args.days,
+        output_path=args.output
+    )
+    if "error" not in result:
+        print(f"AGP Report generated: {result['report']}")
+        print(f"  Period: {result['date_range']}")
+        print(f"  Readings: {result['readings']}")
+        print(f"  Days with data: {result['unique_days']}")
+        
+        # Open in browser if requested
+        if args.open:
+            import webbrowser
+            webbrowser.open(f"file://{result['report']}")
+    return result
+
+
+# Command name -> handler(args) returning the JSON result. Handlers look up
+# the command functions at call time, so they can still be patched.
+_COMMANDS = {
+    "current": lambda args: get_current_glucose(),
+    "analyze": lambda args: analyze_cgm(args.days),
+    "refresh": lambda args: fetch_and_store(args.days),
+    "query": _run_query,
+    "patterns": lambda args: find_patterns(args.days),
+    "alerts": lambda args: detect_trend_alerts(args.days, args.min_occurrences),
+    "day": lambda args: view_day(
+        args.date,
+        hour_start=args.hour_start,
+        hour_end=args.hour_end
+    ),
+    "worst": lambda args: find_worst_days(
+        days=args.days,
+        hour_start=args.hour_start,
+        hour_end=args.hour_end,
+        limit=args.limit,
+        by_tir=args.by_tir
+    ),
+    "chart": _run_chart,
+    "report": _run_report,
+    "compare": lambda args: compare_periods(args.period1, args.period2),
+    "agp": _run_agp,
+    "pump": lambda args: get_pump_status(),
+    "treatments": lambda args: get_treatments(hours=args.hours),
+    "profile": lambda args: get_profile(),
+}
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Nightscout CGM data fetcher and analyzer"
@@ -6062,6 +6647,10 @@ def main():
         "--limit", type=int, default=5,
         help="Number of worst days to show (default: 5)"
     )
+    worst_parser.add_argument(
+        "--by-tir", action="store_true",
+        help="Rank by percentage of readings out of range instead of peak glucose"
+    )
 
     # Chart commands- visual terminal output
     chart_parser = subparsers.add_parser(
@@ -6176,98 +6765,11 @@ def main():
 
     args = parser.parse_args()
 
-    if args.command == "current":
-        result = get_current_glucose()
-    elif args.command == "analyze":
-        result = analyze_cgm(args.days)
-    elif args.command == "refresh":
-        result = fetch_and_store(args.days)
-    elif args.command == "query":
-        day = args.day
-        if day and day.isdigit():
-            day = int(day)
-        result = query_patterns(
-            days=args.days,
-            day_of_week=day,
-            hour_start=args.hour_start,
-            hour_end=args.hour_end
-        )
-    elif args.command == "patterns":
-        result = find_patterns(args.days)
-    elif args.command == "alerts":
-        result = detect_trend_alerts(args.days, args.min_occurrences)
-    elif args.command == "day":
-        result = view_day(
-            args.date,
-            hour_start=args.hour_start,
-            hour_end=args.hour_end
-        )
-    elif args.command == "worst":
-        result = find_worst_days(
-            days=args.days,
-            hour_start=args.hour_start,
-            hour_end=args.hour_end,
-            limit=args.limit
-        )
-    elif args.command == "chart":
-        use_color = args.color
-        if args.week:
-            show_sparkline_week(args.days, use_color=use_color)
-        elif args.sparkline or args.date:
-            show_sparkline(
-                hours=args.hours,
-                use_color=use_color,
-                date_str=args.date,
-                hour_start=args.hour_start,
-                hour_end=args.hour_end
-            )
-        elif args.heatmap:
-            show_heatmap(args.days, use_color=use_color)
-        elif args.day:
-            show_day_chart(args.day, args.days, use_color=use_color)
-        else:
-            show_heatmap(args.days, use_color=use_color)  # Default to heatmap
-        sys.exit(0)
-    elif args.command == "report":
-        result = generate_html_report(
-            days=args.days,
-            output_path=args.output
-        )
-        if "error" not in result:
-            print(f"Report generated: {result['report']}")
-            print(f"  Period: {result['date_range']}")
-            print(f"  Readings: {result['readings']}")
-            
-            # Open in browser if requested
-            if args.open:
-                import webbrowser
-                webbrowser.open(f"file://{result['report']}")
-    elif args.command == "compare":
-        result = compare_periods(args.period1, args.period2)
-    elif args.command == "agp":
-        result = generate_agp_report(
-            days=args.days,
-            output_path=args.output
-        )
-        if "error" not in result:
-            print(f"AGP Report generated: {result['report']}")
-            print(f"  Period: {result['date_range']}")
-            print(f"  Readings: {result['readings']}")
-            print(f"  Days with data: {result['unique_days']}")
-            
-            # Open in browser if requested
-            if args.open:
-                import webbrowser
-                webbrowser.open(f"file://{result['report']}")
-    elif args.command == "pump":
-        result = get_pump_status()
-    elif args.command == "treatments":
-        result = get_treatments(hours=args.hours)
-    elif args.command == "profile":
-        result = get_profile()
-    else:
+    command = _COMMANDS.get(args.command)
+    if command is None:
         parser.print_help()
         sys.exit(1)
+    result = command(args)
 
     print(json.dumps(result, indent=2))
 
@@ -3,14 +3,18 @@ Pytest configuration and shared fixtures for CGM tests.
 """
 import json
 import os
+import shutil
 import sqlite3
 import sys
 import tempfile
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from unittest.mock import MagicMock, patch
+from uuid import uuid4
 
 import pytest
+import requests
 
 # Add scripts directory to path so we can import cgm
 SCRIPTS_DIR = Path(__file__).parent.parent / "scripts"
@@ -60,7 +64,42 @@ def mock_nightscout_settings_mmol():
 def temp_db(tmp_path):
     """Create a temporary database for testing."""
     db_path = tmp_path / "test_cgm_data.db"
-    conn = sqlite3.connect(db_path)
+    _create_readings_table(db_path)
+    return db_path
+
+
+@pytest.fixture
+def test_now():
+    """
+    A single UTC "now" per test, so the rows it generates share one clock
+    reading. It is taken when the test starts rather than once per session:
+    the code under test queries relative to datetime.now(), and a stale value
+    breaks "today" lookups in a run that crosses midnight.
+    """
+    return datetime.now(timezone.utc)
+
+
+@pytest.fixture
+def mem_db():
+    """
+    URI for an in-memory shared-cache database with an empty readings table.
+    Use in place of temp_db when a test never needs the file on disk.
+    """
+    uri = f"file:mem_{uuid4().hex}?mode=memory&cache=shared"
+    keeper = sqlite3.connect(uri, uri=True)  # the database lives while this is open
+    _create_readings_table(uri)
+    yield uri
+    keeper.close()
+
+
+def _connect(db_path):
+    """Connect to a database path or SQLite URI."""
+    return sqlite3.connect(db_path, uri=str(db_path).startswith("file:"))
+
+
+def _create_readings_table(db_path):
+    """Create an empty readings table matching cgm.create_database()."""
+    conn = _connect(db_path)
     conn.execute('''CREATE TABLE IF NOT EXISTS readings (
         id TEXT PRIMARY KEY,
         sgv INTEGER,
@@ -68,17 +107,31 @@ def temp_db(tmp_path):
         date_string TEXT,
         trend INTEGER,
         direction TEXT,
-        device TEXT
+        device TEXT,
+        utc_offset INTEGER NOT NULL DEFAULT 0
     )''')
     conn.commit()
     conn.close()
-    return db_path
 
 
 @pytest.fixture
-def populated_db(temp_db):
-    """Create a database with sample glucose readings."""
+def db_conn(temp_db):
+    """An open, unsynced write connection to temp_db; commit, don't close."""
     conn = sqlite3.connect(temp_db)
+    conn.execute("PRAGMA synchronous=OFF")
+    yield conn
+    conn.close()
+
+
+@pytest.fixture(scope="session")
+def populated_db_template(tmp_path_factory):
+    """
+    Build the sample readings database once per session.
+    Tests get their own copy via populated_db, so writes never leak between tests.
+    """
+    db_path = tmp_path_factory.mktemp("populated") / "template.db"
+    _create_readings_table(db_path)
+    conn = sqlite3.connect(db_path)
     
     # Generate 7 days of realistic glucose data (every 5 minutes)
     now = datetime.now(timezone.utc)
@@ -141,9 +194,61 @@ def populated_db(temp_db):
     conn.commit()
     conn.close()
     
+    return db_path
+
+
+@pytest.fixture
+def populated_db(temp_db, populated_db_template):
+    """Create a database with sample glucose readings (a copy of the session template)."""
+    shutil.copy2(populated_db_template, temp_db)
     return temp_db
 
 
+@pytest.fixture
+def offset_date_string_db(cgm_module, temp_db):
+    """
+    temp_db seeded, through cgm's insert path, with readings whose dateString
+    carries a -05:00 offset, so the wall-clock hour in the string differs from
+    the UTC hour of date_ms. Returns (db_path, wall_clock_hour_start).
+    """
+    hour_start = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+    est = timezone(timedelta(hours=-5))
+    conn = sqlite3.connect(temp_db)
+    with conn:
+        cgm_module._insert_readings(conn, [
+            (f"offset_{i}", sgv, int(dt.timestamp() * 1000), dt.astimezone(est).isoformat(),
+             None, None, None)
+            for i, sgv in enumerate([100, 120])
+            for dt in [hour_start + timedelta(minutes=5 * i)]
+        ])
+    conn.close()
+    return temp_db, hour_start.astimezone(est)
+
+
+@pytest.fixture
+def bulk_insert():
+    """
+    Return insert(db_path, rows) for (id, sgv, date_ms, date_string, direction)
+    rows, written as multi-row INSERTs in a single unsynced transaction.
+    """
+    def insert(db_path, rows):
+        rows = list(rows)
+        conn = _connect(db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")
+        with conn:
+            # One statement per chunk; 500 rows x 5 columns stays under SQLite's variable limit
+            for start in range(0, len(rows), 500):
+                chunk = rows[start:start + 500]
+                conn.execute(
+                    "INSERT INTO readings (id, sgv, date_ms, date_string, direction) VALUES "
+                    + ", ".join(["(?, ?, ?, ?, ?)"] * len(chunk)),
+                    [value for row in chunk for value in row]
+                )
+        conn.close()
+    return insert
+
+
 @pytest.fixture
 def sample_glucose_values():
     """Sample glucose values for testing statistics functions."""
@@ -205,33 +310,94 @@ def sample_readings_with_timestamps():
     return readings
 
 
+@dataclass
+class FakeResponse:
+    """Minimal stand-in for requests.Response; much cheaper than a MagicMock."""
+    payload: object = None
+    status_code: int = 200
+    headers: dict = field(default_factory=dict)
+    json_error: Exception = None
+
+    def json(self):
+        if self.json_error is not None:
+            raise self.json_error
+        return self.payload
+
+    def raise_for_status(self):
+        pass
+
+
 @pytest.fixture
-def mock_requests_get():
-    """Mock requests.get for API calls."""
-    with patch("requests.get") as mock_get:
-        yield mock_get
+def fake_response():
+    """Factory for FakeResponse objects, e.g. fake_response([{"sgv": 120}])."""
+    return FakeResponse
+
+
+@pytest.fixture(scope="session")
+def _session_get_mock():
+    """One MagicMock for requests.Session.get, reused by every test that mocks it."""
+    return MagicMock()
 
 
 @pytest.fixture
-def cgm_module(mock_env, monkeypatch, temp_db):
+def mock_requests_get(monkeypatch, _session_get_mock):
+    """Mock the shared requests session for API calls."""
+    _session_get_mock.reset_mock(return_value=True, side_effect=True)
+    monkeypatch.setattr(requests.Session, "get", _session_get_mock)
+    return _session_get_mock
+
+
+@pytest.fixture(scope="session")
+def _cgm_imported():
     """
-    Import cgm module with mocked environment.
-    This fixture handles the module's initialization safely.
+    Import cgm once per session.
+    cgm.py reads NIGHTSCOUT_URL at import time, so set it for the import.
     """
-    # We need to patch before importing because cgm.py runs code at import time
-    monkeypatch.setenv("NIGHTSCOUT_URL", "https://test.example.com/api/v1/entries.json")
-    
-    # Clear any cached module
-    if "cgm" in sys.modules:
-        del sys.modules["cgm"]
-    
-    # Patch the DB path before import
+    sys.modules.pop("cgm", None)
     with patch.dict("os.environ", {"NIGHTSCOUT_URL": "https://test.example.com/api/v1/entries.json"}):
         import cgm
-        # Override DB_PATH for tests
-        monkeypatch.setattr(cgm, "DB_PATH", temp_db)
-        monkeypatch.setattr(cgm, "_cached_settings", None)
-        yield cgm
+    return cgm
+
+
+@pytest.fixture
+def cgm_module(mock_env, monkeypatch, temp_db, _cgm_imported):
+    """
+    The cgm module pointed at this test's temp_db, with its module-level
+    caches reset so no state leaks between tests.
+    """
+    cgm = _cgm_imported
+    monkeypatch.setenv("NIGHTSCOUT_URL", "https://test.example.com/api/v1/entries.json")
+    # Override DB_PATH, CONFIG_PATH and the default report directory for tests,
+    # so parallel workers never write the same file
+    monkeypatch.setattr(cgm, "SKILL_DIR", temp_db.parent)
+    monkeypatch.setattr(cgm, "DB_PATH", temp_db)
+    monkeypatch.setattr(cgm, "CONFIG_PATH", temp_db.parent / "config.json")
+    monkeypatch.setattr(cgm, "_cached_settings", None)
+    monkeypatch.setattr(cgm, "_derived_settings", {})
+    monkeypatch.setattr(cgm, "_pump_capabilities", None)
+    monkeypatch.setattr(cgm, "_read_conn_cache", None)
+    yield cgm
+    if cgm._read_conn_cache is not None:
+        cgm._read_conn_cache[1].close()
+
+
+DEFAULT_THRESHOLDS = {
+    "urgent_low": 55, "target_low": 70,
+    "target_high": 180, "urgent_high": 250
+}
+
+
+@pytest.fixture
+def default_cgm_env(request, monkeypatch, cgm_module):
+    """
+    cgm_module with data fetching disabled and the default mg/dL thresholds.
+    Parametrize indirectly with True to run in mmol/L instead.
+    """
+    mmol = getattr(request, "param", False)
+    monkeypatch.setattr(cgm_module, "ensure_data", lambda *args, **kwargs: True)
+    monkeypatch.setattr(cgm_module, "use_mmol", lambda: mmol)
+    monkeypatch.setattr(cgm_module, "get_thresholds", lambda: dict(DEFAULT_THRESHOLDS))
+    return cgm_module
 
 
 # Helper functions for tests
@@ -176,6 +176,19 @@ class TestWorstCommand:
                     assert call_kwargs["hour_start"] == 11
                     assert call_kwargs["hour_end"] == 14
                     assert call_kwargs["limit"] == 3
+                    assert call_kwargs["by_tir"] is False
+    
+    def test_worst_command_by_tir(self, cgm_module):
+        """'worst --by-tir' should rank by time out of range."""
+        with patch.object(cgm_module, "find_worst_days") as mock_worst:
+            mock_worst.return_value = {"worst_days": []}
+            with patch.object(sys, "argv", ["cgm.py", "worst", "--by-tir"]):
+                with patch("builtins.print"):
+                    try:
+                        cgm_module.main()
+                    except SystemExit:
+                        pass
+                    assert mock_worst.call_args[1]["by_tir"] is True
 
 
 class TestChartCommand:
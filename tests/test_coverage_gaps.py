@@ -5,7 +5,7 @@ These tests focus on error handling, edge cases, and features not covered by exi
 import sqlite3
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 
 import pytest
 
@@ -14,20 +14,29 @@ class TestConfigFileErrorHandling:
     """Test config file save/load error handling."""
 
     def test_save_config_handles_io_error(self, cgm_module, tmp_path, monkeypatch):
-        """Test that _save_config gracefully handles IOError."""
-        # Point to a directory that exists but make file read-only
-        config_path = tmp_path / "config.json"
+        """A failed write should leave the old config and no temp file behind."""
+        config_dir = tmp_path / "config"
+        config_dir.mkdir()
+        config_path = config_dir / "config.json"
         config_path.write_text('{}')
-        config_path.chmod(0o444)  # Read-only
-        
-        # Point CONFIG_PATH to our test file
         monkeypatch.setattr(cgm_module, 'CONFIG_PATH', config_path)
-        
+
+        def failing_replace(src, dst):
+            raise OSError("disk full")
+        monkeypatch.setattr(cgm_module.os, 'replace', failing_replace)
+
         # This should not raise an exception
         cgm_module._save_config({"test": "value"})
-        
-        # File should still have old content (write failed silently)
+
         assert config_path.read_text() == '{}'
+        assert list(config_dir.iterdir()) == [config_path]
+
+    def test_save_config_replaces_file_atomically(self, cgm_module):
+        """_save_config should write via a temp file and leave none behind."""
+        cgm_module._save_config({"test": "value"})
+
+        assert cgm_module._load_config() == {"test": "value"}
+        assert not list(cgm_module.CONFIG_PATH.parent.glob("*.tmp"))
 
 
 class TestPeriodParsingEdgeCases:
@@ -60,15 +69,12 @@ class TestPeriodParsingEdgeCases:
 class TestSettingsApiErrorHandling:
     """Test error handling in get_nightscout_settings."""
 
-    def test_settings_api_invalid_json(self, cgm_module):
+    def test_settings_api_invalid_json(self, cgm_module, fake_response):
         """Test handling of invalid JSON from settings API."""
         # Mock API to return invalid JSON
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.side_effect = ValueError("Invalid JSON")
-        mock_response.raise_for_status.return_value = None
+        mock_response = fake_response(json_error=ValueError("Invalid JSON"))
         
-        with patch('requests.get', return_value=mock_response):
+        with patch('requests.Session.get', return_value=mock_response):
             # Reset cache
             cgm_module._cached_settings = None
             
@@ -77,15 +83,12 @@ class TestSettingsApiErrorHandling:
             # Should return empty dict on error
             assert settings == {}
 
-    def test_settings_api_non_dict_response(self, cgm_module):
+    def test_settings_api_non_dict_response(self, cgm_module, fake_response):
         """Test handling when settings API returns non-dict."""
         # Mock API to return a list instead of dict
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = ["not", "a", "dict"]
-        mock_response.raise_for_status.return_value = None
+        mock_response = fake_response(["not", "a", "dict"])
         
-        with patch('requests.get', return_value=mock_response):
+        with patch('requests.Session.get', return_value=mock_response):
             # Reset cache
             cgm_module._cached_settings = None
             
@@ -95,10 +98,86 @@ class TestSettingsApiErrorHandling:
             assert settings == {}
 
 
+class TestSettingsDiskCache:
+    """Test the config.json cache for Nightscout settings."""
+
+    def test_settings_saved_to_config(self, cgm_module, fake_response):
+        """A successful fetch should be persisted for later invocations."""
+        mock_response = fake_response({"settings": {"units": "mmol"}})
+
+        with patch('requests.Session.get', return_value=mock_response):
+            cgm_module.get_nightscout_settings()
+
+        cached = cgm_module._load_config()["nightscout_settings"]
+        assert cached["settings"] == {"units": "mmol"}
+        assert "_checked_at" in cached
+
+    def test_fresh_cache_skips_request(self, cgm_module):
+        """Settings cached within the TTL should not hit the network."""
+        cgm_module._save_config({"nightscout_settings": {
+            "settings": {"units": "mmol"},
+            "_checked_at": datetime.now(timezone.utc).isoformat()
+        }})
+
+        with patch('requests.Session.get') as mock_get:
+            settings = cgm_module.get_nightscout_settings()
+
+        mock_get.assert_not_called()
+        assert settings == {"units": "mmol"}
+
+    def test_stale_cache_refetches(self, cgm_module, fake_response):
+        """Settings older than the TTL should be fetched again."""
+        stale = datetime.now(timezone.utc) - cgm_module.SETTINGS_CACHE_TTL - timedelta(minutes=1)
+        cgm_module._save_config({"nightscout_settings": {
+            "settings": {"units": "mmol"},
+            "_checked_at": stale.isoformat()
+        }})
+        mock_response = fake_response({"settings": {"units": "mg/dl"}})
+
+        with patch('requests.Session.get', return_value=mock_response) as mock_get:
+            settings = cgm_module.get_nightscout_settings()
+
+        mock_get.assert_called_once()
+        assert settings == {"units": "mg/dl"}
+
+    def test_stale_cache_revalidates_with_etag(self, cgm_module, fake_response):
+        """A 304 for the stored ETag should reuse the cached settings."""
+        stale = datetime.now(timezone.utc) - cgm_module.SETTINGS_CACHE_TTL - timedelta(minutes=1)
+        cgm_module._save_config({"nightscout_settings": {
+            "settings": {"units": "mmol"},
+            "_checked_at": stale.isoformat(),
+            "etag": 'W/"abc"'
+        }})
+        # A 304 has no body; decoding it would fail the test
+        mock_response = fake_response(status_code=304, json_error=AssertionError("json() read on a 304"))
+
+        with patch('requests.Session.get', return_value=mock_response) as mock_get:
+            settings = cgm_module.get_nightscout_settings()
+
+        assert mock_get.call_args.kwargs["headers"] == {"If-None-Match": 'W/"abc"'}
+        assert settings == {"units": "mmol"}
+        checked = datetime.fromisoformat(cgm_module._load_config()["nightscout_settings"]["_checked_at"])
+        assert checked > stale
+
+    def test_fetch_stores_validators(self, cgm_module, fake_response):
+        """ETag and Last-Modified from a full response should be cached."""
+        mock_response = fake_response(
+            {"settings": {"units": "mg/dl"}},
+            headers={"ETag": '"v1"', "Last-Modified": "Wed, 14 Oct 2026 10:00:00 GMT"}
+        )
+
+        with patch('requests.Session.get', return_value=mock_response):
+            cgm_module.get_nightscout_settings()
+
+        cached = cgm_module._load_config()["nightscout_settings"]
+        assert cached["etag"] == '"v1"'
+        assert cached["last_modified"] == "Wed, 14 Oct 2026 10:00:00 GMT"
+
+
 class TestRequestExceptionHandling:
     """Test various RequestException handling paths."""
 
-    def test_devicestatus_network_error(self, cgm_module):
+    def test_devicestatus_network_error(self, cgm_module, fake_response):
         """Test that devicestatus network errors are handled gracefully."""
         import requests
         
@@ -106,12 +185,9 @@ class TestRequestExceptionHandling:
             if "devicestatus" in url:
                 raise requests.RequestException("Network timeout")
             # Return success for other endpoints
-            mock_resp = MagicMock()
-            mock_resp.status_code = 200
-            mock_resp.json.return_value = []
-            return mock_resp
+            return fake_response([])
         
-        with patch('requests.get', side_effect=mock_get):
+        with patch('requests.Session.get', side_effect=mock_get):
             # Reset cache
             cgm_module._pump_capabilities = None
             
@@ -121,7 +197,7 @@ class TestRequestExceptionHandling:
             assert result is not None
             assert "has_devicestatus" in result
 
-    def test_profile_network_error(self, cgm_module):
+    def test_profile_network_error(self, cgm_module, fake_response):
         """Test that profile endpoint network errors are handled gracefully."""
         import requests
         
@@ -129,12 +205,9 @@ class TestRequestExceptionHandling:
             if "profile" in url:
                 raise requests.RequestException("Network timeout")
             # Return success for other endpoints
-            mock_resp = MagicMock()
-            mock_resp.status_code = 200
-            mock_resp.json.return_value = []
-            return mock_resp
+            return fake_response([])
         
-        with patch('requests.get', side_effect=mock_get):
+        with patch('requests.Session.get', side_effect=mock_get):
             # Reset cache
             cgm_module._pump_capabilities = None
             
@@ -143,3 +216,29 @@ class TestRequestExceptionHandling:
             # Should complete without error
             assert result is not None
             assert "has_profile" in result
+
+
+class TestHttpRetry:
+    """Test the retry policy on the shared Nightscout session."""
+
+    def test_retry_after_is_capped(self, cgm_module):
+        """A throttled host's long Retry-After should not stall the CLI."""
+        from urllib3.response import HTTPResponse
+
+        retry = cgm_module.SESSION.get_adapter("https://").max_retries
+        response = HTTPResponse(status=429, headers={"Retry-After": "3600"})
+
+        assert 429 in retry.status_forcelist
+        with patch("urllib3.util.retry.time.sleep") as mock_sleep:
+            retry.increment(method="GET", url="/api/v1/entries.json", response=response).sleep(response)
+
+        mock_sleep.assert_called_once_with(cgm_module.RETRY_AFTER_MAX)
+
+    def test_short_retry_after_is_honoured(self, cgm_module):
+        """Retry-After values under the cap are used as sent."""
+        from urllib3.response import HTTPResponse
+
+        retry = cgm_module.SESSION.get_adapter("https://").max_retries
+        response = HTTPResponse(status=429, headers={"Retry-After": "2"})
+
+        assert retry.get_retry_after(response) == 2
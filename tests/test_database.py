@@ -53,6 +53,99 @@ class TestCreateDatabase:
             assert cursor.fetchone()[0] == 0
             conn3.close()
 
+    def test_enables_wal_journal(self, cgm_module, tmp_path):
+        """Database should be opened in WAL mode for faster commits."""
+        db_path = tmp_path / "test_db.db"
+        with patch.object(cgm_module, "DB_PATH", db_path):
+            conn = cgm_module.create_database()
+            mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            conn.close()
+
+            assert mode == "wal"
+
+    def test_sets_read_pragmas(self, cgm_module, tmp_path):
+        """Connection should keep temp tables in memory and memory-map the file."""
+        db_path = tmp_path / "test_db.db"
+        with patch.object(cgm_module, "DB_PATH", db_path):
+            conn = cgm_module.create_database()
+            temp_store = conn.execute("PRAGMA temp_store").fetchone()[0]
+            mmap_size = conn.execute("PRAGMA mmap_size").fetchone()[0]
+            conn.close()
+
+            assert temp_store == 2  # MEMORY
+            assert mmap_size > 0
+
+    def test_read_connection_is_shared_and_read_only(self, cgm_module, tmp_path):
+        """Read paths should reuse one read-only connection per DB_PATH."""
+        db_path = tmp_path / "test_db.db"
+        other_path = tmp_path / "other_db.db"
+        with patch.object(cgm_module, "DB_PATH", db_path):
+            cgm_module.create_database().close()
+            conn = cgm_module._read_conn()
+            assert cgm_module._read_conn() is conn
+            with pytest.raises(sqlite3.OperationalError):
+                conn.execute("DELETE FROM readings")
+
+        with patch.object(cgm_module, "DB_PATH", other_path):
+            cgm_module.create_database().close()
+            assert cgm_module._read_conn() is not conn
+
+    def test_accepts_sqlite_uri(self, cgm_module, mem_db):
+        """A file: URI DB_PATH should be opened as-is for reads and writes."""
+        with patch.object(cgm_module, "DB_PATH", mem_db):
+            conn = cgm_module.create_database()
+            conn.execute("INSERT INTO readings (id, sgv, date_ms) VALUES ('a', 120, 0)")
+            conn.commit()
+            conn.close()
+            assert cgm_module.ensure_data()
+            assert cgm_module._read_conn().execute("SELECT COUNT(*) FROM readings").fetchone()[0] == 1
+
+    def test_adds_utc_offset_to_existing_database(self, cgm_module, tmp_path):
+        """A database from before utc_offset gets the column, filled from date_string."""
+        db_path = tmp_path / "test_db.db"
+        conn = sqlite3.connect(db_path)
+        conn.execute(
+            "CREATE TABLE readings (id TEXT PRIMARY KEY, sgv INTEGER, date_ms INTEGER,"
+            " date_string TEXT, trend INTEGER, direction TEXT, device TEXT)"
+        )
+        conn.executemany(
+            "INSERT INTO readings (id, sgv, date_ms, date_string) VALUES (?, ?, ?, ?)",
+            [("a", 120, 0, "1969-12-31T19:00:00.000-05:00"), ("b", 130, 0, "1970-01-01T00:00:00.000Z")]
+        )
+        conn.commit()
+        conn.close()
+
+        with patch.object(cgm_module, "DB_PATH", db_path):
+            rows = cgm_module._read_conn().execute(
+                "SELECT id, utc_offset FROM readings ORDER BY id"
+            ).fetchall()
+
+        assert rows == [("a", -300), ("b", 0)]
+
+    def test_creates_date_index(self, cgm_module, tmp_path):
+        """Range queries on date_ms should be served by an index."""
+        db_path = tmp_path / "test_db.db"
+        with patch.object(cgm_module, "DB_PATH", db_path):
+            conn = cgm_module.create_database()
+            plan = conn.execute(
+                "EXPLAIN QUERY PLAN SELECT sgv FROM readings WHERE date_ms >= ?", (0,)
+            ).fetchall()
+            conn.close()
+
+            assert any("idx_readings_date_sgv" in row[-1] for row in plan)
+
+    def test_date_index_covers_sgv(self, cgm_module, tmp_path):
+        """Selecting sgv over a date range should be answered from the index alone."""
+        db_path = tmp_path / "test_db.db"
+        with patch.object(cgm_module, "DB_PATH", db_path):
+            conn = cgm_module.create_database()
+            plan = conn.execute(
+                "EXPLAIN QUERY PLAN SELECT sgv FROM readings WHERE date_ms >= ? AND sgv > 0", (0,)
+            ).fetchall()
+            conn.close()
+
+            assert any("COVERING INDEX idx_readings_date_sgv" in row[-1] for row in plan)
+
 
 class TestEnsureData:
     """Tests for ensure_data function."""
@@ -83,6 +176,7 @@ class TestEnsureData:
                 assert result is False
 
 
+@pytest.mark.usefixtures("default_cgm_env")
 class TestFetchAndStore:
     """Tests for fetch_and_store function."""
     
@@ -130,6 +224,31 @@ class TestFetchAndStore:
             assert cursor.fetchone()[0] == 2
             conn.close()
     
+    def test_keeps_hourly_rollup_current(self, cgm_module, temp_db, mock_requests_get):
+        """The refresh folds new readings into the hourly rollup, so find_patterns only reads."""
+        now = datetime.now(timezone.utc)
+        mock_entries = [
+            {
+                "_id": f"entry{i}",
+                "sgv": 100 + i,
+                "date": int((now - timedelta(minutes=5 * i)).timestamp() * 1000),
+                "dateString": (now - timedelta(minutes=5 * i)).isoformat(),
+                "type": "sgv"
+            }
+            for i in range(12)
+        ]
+        mock_requests_get.return_value = MagicMock(
+            json=MagicMock(side_effect=[mock_entries, []]),
+            raise_for_status=MagicMock()
+        )
+
+        with patch.object(cgm_module, "DB_PATH", temp_db):
+            cgm_module.fetch_and_store(days=1)
+            with patch.object(cgm_module, "_connect", side_effect=AssertionError("find_patterns wrote")):
+                result = cgm_module.find_patterns(days=1)
+
+        assert result["total_readings"] == 12
+
     def test_handles_api_error(self, cgm_module, temp_db, mock_requests_get):
         """Should return error dict on API failure."""
         import requests
@@ -140,6 +259,55 @@ class TestFetchAndStore:
             
             assert "error" in result
     
+    def test_keeps_windows_fetched_before_an_error(self, cgm_module, temp_db, mock_requests_get):
+        """A failed window should not discard readings from windows that succeeded."""
+        import requests
+        now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+
+        def fake_get(url, params=None, **kwargs):
+            if "find[date][$lte]" in params:
+                raise requests.RequestException("Connection reset")
+            entries = [{"_id": "recent", "sgv": 120, "date": now_ms, "type": "sgv"}]
+            return MagicMock(json=MagicMock(return_value=entries), raise_for_status=MagicMock())
+
+        mock_requests_get.side_effect = fake_get
+        with patch.object(cgm_module, "DB_PATH", temp_db):
+            result = cgm_module.fetch_and_store(days=90)
+
+        assert "error" in result
+        assert result["new_readings"] == 1
+        conn = sqlite3.connect(temp_db)
+        assert conn.execute("SELECT id FROM readings").fetchall() == [("recent",)]
+        conn.close()
+
+    def test_analyzes_only_initial_backfill(self, cgm_module, temp_db, mock_requests_get):
+        """A full ANALYZE should run after the first backfill, not on every refresh."""
+        now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+        batches = iter([[{"_id": "first", "sgv": 120, "date": now_ms, "type": "sgv"}],
+                        [{"_id": "second", "sgv": 130, "date": now_ms, "type": "sgv"}]])
+        mock_requests_get.side_effect = lambda url, **kwargs: MagicMock(
+            json=MagicMock(return_value=next(batches)), raise_for_status=MagicMock()
+        )
+        statements = []
+
+        with patch.object(cgm_module, "DB_PATH", temp_db):
+            cgm_module.fetch_and_store(days=1)
+            conn = sqlite3.connect(temp_db)
+            assert conn.execute("SELECT COUNT(*) FROM sqlite_stat1").fetchone()[0] > 0
+            conn.close()
+
+            create = cgm_module.create_database
+            def traced_create():
+                conn = create()
+                conn.set_trace_callback(statements.append)
+                return conn
+            with patch.object(cgm_module, "create_database", traced_create):
+                result = cgm_module.fetch_and_store(days=1)
+
+        assert result["new_readings"] == 1
+        assert "ANALYZE" not in statements
+        assert "PRAGMA optimize" in statements
+
     def test_skips_non_sgv_entries(self, cgm_module, temp_db, mock_requests_get):
         """Should skip non-SGV entries (like calibrations)."""
         now = datetime.now(timezone.utc)
@@ -181,7 +349,7 @@ class TestFetchAndStore:
         }
         
         mock_requests_get.return_value = MagicMock(
-            json=MagicMock(side_effect=[[mock_entry], [], [mock_entry], []]),
+            json=MagicMock(side_effect=[[mock_entry], [mock_entry]]),
             raise_for_status=MagicMock()
         )
         
@@ -198,6 +366,69 @@ class TestFetchAndStore:
             conn.close()
 
 
+    def test_stores_partial_insert_chunks(self, cgm_module, temp_db, mock_requests_get):
+        """Rows beyond the last full insert chunk should be stored too."""
+        now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+        count = cgm_module.INSERT_CHUNK_ROWS * 2 + 7
+        entries = [
+            {"_id": f"e{i}", "sgv": 100, "date": now_ms - i * 60000, "type": "sgv"}
+            for i in range(count)
+        ]
+        mock_requests_get.return_value = MagicMock(
+            json=MagicMock(return_value=entries),
+            raise_for_status=MagicMock()
+        )
+
+        with patch.object(cgm_module, "DB_PATH", temp_db):
+            first = cgm_module.fetch_and_store(days=1)
+            second = cgm_module.fetch_and_store(days=1)
+
+        assert first["new_readings"] == count
+        assert second["new_readings"] == 0
+        assert second["total_readings"] == count
+
+    def test_fetches_backfill_windows(self, cgm_module, temp_db, mock_requests_get):
+        """A long backfill should be split into date windows covering the range."""
+        mock_requests_get.return_value = MagicMock(
+            json=MagicMock(return_value=[]),
+            raise_for_status=MagicMock()
+        )
+
+        with patch.object(cgm_module, "DB_PATH", temp_db):
+            cgm_module.fetch_and_store(days=90)
+
+        params = sorted(
+            (c.kwargs["params"] for c in mock_requests_get.call_args_list),
+            key=lambda p: p["find[date][$gte]"]
+        )
+        assert len(params) == 3
+        for prev, nxt in zip(params, params[1:]):
+            assert prev["find[date][$lte]"] + 1 == nxt["find[date][$gte]"]
+        assert "find[date][$lte]" not in params[-1]
+
+    def test_pages_saturated_window(self, cgm_module, temp_db, mock_requests_get):
+        """A window that returns a full page should be paged until exhausted."""
+        now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+        entries = [
+            {"_id": f"e{i}", "sgv": 100 + i, "date": now_ms - i * 300000, "type": "sgv"}
+            for i in range(5)
+        ]
+
+        def fake_get(url, params=None, **kwargs):
+            hi = params.get("find[date][$lte]", float("inf"))
+            page = [e for e in entries if e["date"] <= hi][:params["count"]]
+            return MagicMock(json=MagicMock(return_value=page), raise_for_status=MagicMock())
+
+        mock_requests_get.side_effect = fake_get
+        with patch.object(cgm_module, "DB_PATH", temp_db), \
+             patch.object(cgm_module, "FETCH_PAGE_SIZE", 2):
+            result = cgm_module.fetch_and_store(days=1)
+
+        assert result["new_readings"] == 5
+        assert mock_requests_get.call_count == 3
+
+
+@pytest.mark.usefixtures("default_cgm_env")
 class TestDatabaseIntegrity:
     """Tests for database integrity and edge cases."""
     
@@ -1,57 +1,36 @@
 """
 Tests for edge cases, error handling, and integration scenarios.
 """
-import sqlite3
 import pytest
-from datetime import datetime, timedelta, timezone
-from unittest.mock import patch, MagicMock
+from datetime import datetime
 import requests
 
 
 class TestNightscoutUrlNormalization:
     """Tests for flexible NIGHTSCOUT_URL handling."""
-    
-    def test_full_url_unchanged(self, cgm_module):
-        """Full URL with /api/v1/entries.json should be unchanged."""
-        url = "https://my-ns.herokuapp.com/api/v1/entries.json"
-        result = cgm_module._normalize_nightscout_url(url)
-        assert result == url
-    
-    def test_domain_only(self, cgm_module):
-        """Just domain should get full path appended."""
-        url = "https://my-ns.herokuapp.com"
-        result = cgm_module._normalize_nightscout_url(url)
-        assert result == "https://my-ns.herokuapp.com/api/v1/entries.json"
-    
-    def test_domain_with_trailing_slash(self, cgm_module):
-        """Domain with trailing slash should work."""
-        url = "https://my-ns.herokuapp.com/"
-        result = cgm_module._normalize_nightscout_url(url)
-        assert result == "https://my-ns.herokuapp.com/api/v1/entries.json"
-    
-    def test_partial_api_path(self, cgm_module):
-        """Partial /api path should be completed."""
-        url = "https://my-ns.herokuapp.com/api"
-        result = cgm_module._normalize_nightscout_url(url)
-        assert result == "https://my-ns.herokuapp.com/api/v1/entries.json"
-    
-    def test_partial_api_v1_path(self, cgm_module):
-        """Partial /api/v1 path should be completed."""
-        url = "https://my-ns.herokuapp.com/api/v1"
-        result = cgm_module._normalize_nightscout_url(url)
-        assert result == "https://my-ns.herokuapp.com/api/v1/entries.json"
-    
-    def test_entries_without_json(self, cgm_module):
-        """/api/v1/entries without .json should add it."""
-        url = "https://my-ns.herokuapp.com/api/v1/entries"
-        result = cgm_module._normalize_nightscout_url(url)
-        assert result == "https://my-ns.herokuapp.com/api/v1/entries.json"
-    
-    def test_custom_subdomain(self, cgm_module):
-        """Works with custom subdomains."""
-        url = "https://nightscout.example.org"
-        result = cgm_module._normalize_nightscout_url(url)
-        assert result == "https://nightscout.example.org/api/v1/entries.json"
+
+    @pytest.mark.parametrize("url,expected", [
+        # Full URL with /api/v1/entries.json is unchanged
+        pytest.param("https://my-ns.herokuapp.com/api/v1/entries.json",
+                     "https://my-ns.herokuapp.com/api/v1/entries.json", id="full_url_unchanged"),
+        # Bare domain, with or without trailing slash, gets the full path appended
+        pytest.param("https://my-ns.herokuapp.com",
+                     "https://my-ns.herokuapp.com/api/v1/entries.json", id="domain_only"),
+        pytest.param("https://my-ns.herokuapp.com/",
+                     "https://my-ns.herokuapp.com/api/v1/entries.json", id="domain_with_trailing_slash"),
+        # Partial API paths are completed
+        pytest.param("https://my-ns.herokuapp.com/api",
+                     "https://my-ns.herokuapp.com/api/v1/entries.json", id="partial_api_path"),
+        pytest.param("https://my-ns.herokuapp.com/api/v1",
+                     "https://my-ns.herokuapp.com/api/v1/entries.json", id="partial_api_v1_path"),
+        pytest.param("https://my-ns.herokuapp.com/api/v1/entries",
+                     "https://my-ns.herokuapp.com/api/v1/entries.json", id="entries_without_json"),
+        pytest.param("https://nightscout.example.org",
+                     "https://nightscout.example.org/api/v1/entries.json", id="custom_subdomain"),
+    ])
+    def test_normalize(self, cgm_module, url, expected):
+        """URLs should be normalized to the entries.json endpoint."""
+        assert cgm_module._normalize_nightscout_url(url) == expected
 
 
 class TestErrorHandling:
@@ -64,324 +43,206 @@ class TestErrorHandling:
         result = cgm_module.get_current_glucose()
         assert "error" in result
     
-    def test_invalid_json_response(self, cgm_module, mock_requests_get):
+    def test_invalid_json_response(self, cgm_module, mock_requests_get, fake_response):
         """Invalid JSON should be handled gracefully."""
         # Note: Currently the code doesn't catch json decode errors.
         # This test documents that ValueError will be raised.
         # Consider adding try/except for json.JSONDecodeError in get_current_glucose
-        mock_response = MagicMock()
-        mock_response.json.side_effect = ValueError("Invalid JSON")
-        mock_response.raise_for_status = MagicMock()
-        mock_requests_get.return_value = mock_response
+        mock_requests_get.return_value = fake_response(json_error=ValueError("Invalid JSON"))
         
         with pytest.raises(ValueError):
             cgm_module.get_current_glucose()
     
-    def test_empty_api_response(self, cgm_module, mock_requests_get):
+    def test_empty_api_response(self, cgm_module, mock_requests_get, fake_response):
         """Empty API response should be handled."""
-        mock_response = MagicMock()
-        mock_response.json.return_value = []
-        mock_response.raise_for_status = MagicMock()
-        mock_requests_get.return_value = mock_response
+        mock_requests_get.return_value = fake_response([])
         
         result = cgm_module.get_current_glucose()
         assert "error" in result
     
-    def test_missing_sgv_in_response(self, cgm_module, mock_requests_get):
+    def test_missing_sgv_in_response(self, cgm_module, mock_requests_get, fake_response):
         """Response without sgv field should be handled."""
-        mock_response = MagicMock()
-        mock_response.json.return_value = [{"date": 123456, "direction": "Flat"}]
-        mock_response.raise_for_status = MagicMock()
-        mock_requests_get.return_value = mock_response
+        mock_requests_get.return_value = fake_response([{"date": 123456, "direction": "Flat"}])
         
         result = cgm_module.get_current_glucose()
         # Should handle missing sgv gracefully
         assert result is not None
 
 
+@pytest.mark.usefixtures("default_cgm_env")
 class TestBoundaryConditions:
     """Tests for boundary conditions."""
     
     def test_zero_days_analysis(self, cgm_module, populated_db):
         """Zero days should return empty/error."""
-        with patch.object(cgm_module, "DB_PATH", populated_db):
-            with patch.object(cgm_module, "ensure_data", return_value=True):
-                result = cgm_module.analyze_cgm(days=0)
-                # Should either error or return empty results
-                assert result is not None
-    
-    def test_very_large_days_value(self, cgm_module, populated_db):
+        result = cgm_module.analyze_cgm(days=0)
+        # Should either error or return empty results
+        assert result is not None
+
+    def test_very_large_days_value(self, cgm_module, populated_db, benchmark):
         """Very large days value should work."""
-        with patch.object(cgm_module, "DB_PATH", populated_db):
-            with patch.object(cgm_module, "ensure_data", return_value=True):
-                with patch.object(cgm_module, "use_mmol", return_value=False):
-                    with patch.object(cgm_module, "get_thresholds", return_value={
-                        "urgent_low": 55, "target_low": 70,
-                        "target_high": 180, "urgent_high": 250
-                    }):
-                        result = cgm_module.analyze_cgm(days=3650)  # 10 years
-                        assert result is not None
-    
+        result = benchmark(cgm_module.analyze_cgm, days=3650)  # 10 years
+        assert result is not None
+
     def test_extreme_glucose_values(self, cgm_module):
         """Extreme glucose values should be handled."""
-        with patch.object(cgm_module, "use_mmol", return_value=False):
-            with patch.object(cgm_module, "get_unit_label", return_value="mg/dL"):
-                # Very low
-                stats = cgm_module.get_stats([20, 25, 30])
-                assert stats["min"] == 20
-                
-                # Very high
-                stats = cgm_module.get_stats([500, 550, 600])
-                assert stats["max"] == 600
-    
-    def test_single_reading_analysis(self, cgm_module, temp_db):
+        # Very low
+        stats = cgm_module.get_stats([20, 25, 30])
+        assert stats["min"] == 20
+
+        # Very high
+        stats = cgm_module.get_stats([500, 550, 600])
+        assert stats["max"] == 600
+
+    def test_single_reading_analysis(self, cgm_module, mem_db, bulk_insert, monkeypatch, test_now):
         """Single reading should be handled."""
         # Insert single reading
-        conn = sqlite3.connect(temp_db)
-        now = datetime.now(timezone.utc)
-        conn.execute(
-            "INSERT INTO readings (id, sgv, date_ms, date_string, direction) VALUES (?, ?, ?, ?, ?)",
-            ("single", 120, int(now.timestamp() * 1000), now.isoformat(), "Flat")
-        )
-        conn.commit()
-        conn.close()
+        now = test_now
+        bulk_insert(mem_db, [("single", 120, int(now.timestamp() * 1000), now.isoformat(), "Flat")])
         
-        with patch.object(cgm_module, "DB_PATH", temp_db):
-            with patch.object(cgm_module, "ensure_data", return_value=True):
-                with patch.object(cgm_module, "use_mmol", return_value=False):
-                    with patch.object(cgm_module, "get_thresholds", return_value={
-                        "urgent_low": 55, "target_low": 70,
-                        "target_high": 180, "urgent_high": 250
-                    }):
-                        result = cgm_module.analyze_cgm(days=1)
-                        assert result["readings"] == 1
+        monkeypatch.setattr(cgm_module, "DB_PATH", mem_db)
+        result = cgm_module.analyze_cgm(days=1)
+        assert result["readings"] == 1
 
 
+@pytest.mark.usefixtures("default_cgm_env")
 class TestDateParsing:
     """Tests for date parsing edge cases."""
     
-    def test_future_date(self, cgm_module, populated_db):
-        """Future dates should work but return no data."""
-        with patch.object(cgm_module, "DB_PATH", populated_db):
-            with patch.object(cgm_module, "ensure_data", return_value=True):
-                with patch.object(cgm_module, "use_mmol", return_value=False):
-                    with patch.object(cgm_module, "get_thresholds", return_value={
-                        "urgent_low": 55, "target_low": 70,
-                        "target_high": 180, "urgent_high": 250
-                    }):
-                        result = cgm_module.view_day("2030-01-01")
-                        # Should return error or empty readings
-                        assert "error" in result or len(result.get("readings", [])) == 0
-    
-    def test_very_old_date(self, cgm_module, populated_db):
-        """Very old dates should work but return no data."""
-        with patch.object(cgm_module, "DB_PATH", populated_db):
-            with patch.object(cgm_module, "ensure_data", return_value=True):
-                with patch.object(cgm_module, "use_mmol", return_value=False):
-                    with patch.object(cgm_module, "get_thresholds", return_value={
-                        "urgent_low": 55, "target_low": 70,
-                        "target_high": 180, "urgent_high": 250
-                    }):
-                        result = cgm_module.view_day("2000-01-01")
-                        # Should return error or empty readings
-                        assert "error" in result or len(result.get("readings", [])) == 0
-    
-    def test_whitespace_in_date(self, cgm_module):
-        """Dates with leading/trailing whitespace should work."""
-        result = cgm_module.parse_date_arg("  today  ")
-        assert result == datetime.now().date()
-    
-    def test_mixed_case_month(self, cgm_module):
-        """Month names with mixed case should work."""
-        result = cgm_module.parse_date_arg("JaNuArY 15")
-        assert result.month == 1
-        assert result.day == 15
-
-
+    @pytest.mark.parametrize("date_str", ["2030-01-01", "2000-01-01"], ids=["future", "old"])
+    def test_out_of_range_date(self, cgm_module, populated_db, date_str):
+        """Dates outside the stored data should work but return no data."""
+        result = cgm_module.view_day(date_str)
+        # Should return error or empty readings
+        assert "error" in result or len(result.get("readings", [])) == 0
+
+    @pytest.mark.parametrize("date_str,expected_attrs", [
+        # Leading/trailing whitespace is ignored
+        ("  today  ", {"year": datetime.now().year, "month": datetime.now().month, "day": datetime.now().day}),
+        # Month names are case-insensitive
+        ("JaNuArY 15", {"month": 1, "day": 15}),
+    ], ids=["whitespace", "mixed_case_month"])
+    def test_parse_date_arg_normalizes_input(self, cgm_module, date_str, expected_attrs):
+        """Untidy date strings should still parse."""
+        result = cgm_module.parse_date_arg(date_str)
+        assert {attr: getattr(result, attr) for attr in expected_attrs} == expected_attrs
+
+
+@pytest.mark.usefixtures("default_cgm_env")
 class TestTimeRanges:
     """Tests for time range handling."""
     
     def test_inverted_hour_range(self, cgm_module, populated_db):
         """Inverted hour range (end < start) behavior."""
-        with patch.object(cgm_module, "DB_PATH", populated_db):
-            with patch.object(cgm_module, "ensure_data", return_value=True):
-                with patch.object(cgm_module, "use_mmol", return_value=False):
-                    with patch.object(cgm_module, "get_thresholds", return_value={
-                        "urgent_low": 55, "target_low": 70,
-                        "target_high": 180, "urgent_high": 250
-                    }):
-                        # Start > End (e.g., overnight: 22 to 6)
-                        result = cgm_module.view_day("today", hour_start=22, hour_end=6)
-                        # Should still work (might return no data for simple BETWEEN)
-                        assert result is not None
-    
+        # Start > End (e.g., overnight: 22 to 6)
+        result = cgm_module.view_day("today", hour_start=22, hour_end=6)
+        # Should still work (might return no data for simple BETWEEN)
+        assert result is not None
+
     def test_same_start_end_hour(self, cgm_module, populated_db):
         """Same start and end hour should return that hour."""
-        with patch.object(cgm_module, "DB_PATH", populated_db):
-            with patch.object(cgm_module, "ensure_data", return_value=True):
-                with patch.object(cgm_module, "use_mmol", return_value=False):
-                    with patch.object(cgm_module, "get_thresholds", return_value={
-                        "urgent_low": 55, "target_low": 70,
-                        "target_high": 180, "urgent_high": 250
-                    }):
-                        result = cgm_module.view_day("today", hour_start=12, hour_end=12)
-                        # Should return readings for hour 12 only
-                        for reading in result.get("readings", []):
-                            hour = int(reading["time"].split(":")[0])
-                            assert hour == 12
+        result = cgm_module.view_day("today", hour_start=12, hour_end=12)
+        # Should return readings for hour 12 only
+        for reading in result.get("readings", []):
+            hour = int(reading["time"].split(":")[0])
+            assert hour == 12
 
 
+@pytest.mark.usefixtures("default_cgm_env")
 class TestGlucoseStatus:
     """Tests for glucose status categorization."""
     
-    def test_all_status_categories(self, cgm_module, temp_db):
+    @pytest.mark.parametrize("sgv,expected", [
+        (40, "very_low"),    # < 55
+        (60, "low"),         # 55-69
+        (100, "in_range"),   # 70-180
+        (200, "high"),       # 181-250
+        (300, "very_high"),  # > 250
+    ])
+    def test_all_status_categories(self, cgm_module, temp_db, bulk_insert, test_now, sgv, expected):
         """All status categories should be assigned correctly."""
-        conn = sqlite3.connect(temp_db)
-        now = datetime.now(timezone.utc)
-        
-        test_values = [
-            (40, "very_low"),    # < 55
-            (60, "low"),         # 55-69
-            (100, "in_range"),   # 70-180
-            (200, "high"),       # 181-250
-            (300, "very_high"),  # > 250
+        now = test_now
+        bulk_insert(temp_db, [("test", sgv, int(now.timestamp() * 1000), now.isoformat(), "Flat")])
+
+        result = cgm_module.view_day("today")
+
+        assert [r["status"] for r in result["readings"]] == [expected]
+
+    def test_current_glucose_status_boundaries(self, cgm_module, mock_requests_get, fake_response):
+        """Current reading status should treat lower bounds as exclusive, upper as inclusive."""
+        cases = [
+            (54, "VERY LOW - urgent"), (55, "low"), (69, "low"), (70, "in range"),
+            (180, "in range"), (181, "high"), (250, "high"), (251, "VERY HIGH"),
         ]
-        
-        for i, (sgv, expected_status) in enumerate(test_values):
-            dt = now - timedelta(minutes=i*5)
-            conn.execute(
-                "INSERT INTO readings (id, sgv, date_ms, date_string, direction) VALUES (?, ?, ?, ?, ?)",
-                (f"test_{i}", sgv, int(dt.timestamp() * 1000), dt.isoformat(), "Flat")
-            )
-        conn.commit()
-        conn.close()
-        
-        with patch.object(cgm_module, "DB_PATH", temp_db):
-            with patch.object(cgm_module, "ensure_data", return_value=True):
-                with patch.object(cgm_module, "use_mmol", return_value=False):
-                    with patch.object(cgm_module, "get_thresholds", return_value={
-                        "urgent_low": 55, "target_low": 70,
-                        "target_high": 180, "urgent_high": 250
-                    }):
-                        result = cgm_module.view_day("today")
-                        
-                        statuses = {r["glucose"]: r["status"] for r in result.get("readings", [])}
-                        
-                        for sgv, expected in test_values:
-                            if sgv in statuses:
-                                assert statuses[sgv] == expected
+        for sgv, expected in cases:
+            mock_requests_get.return_value = fake_response([{"sgv": sgv, "direction": "Flat"}])
+            assert cgm_module.get_current_glucose()["status"] == expected
 
 
+@pytest.mark.parametrize("default_cgm_env", [True], ids=["mmol"], indirect=True)
+@pytest.mark.usefixtures("default_cgm_env")
 class TestMmolConversion:
     """Tests for mmol/L conversion in various scenarios."""
     
-    def test_analysis_output_in_mmol(self, cgm_module, populated_db):
+    def test_analysis_output_in_mmol(self, cgm_module, populated_db, benchmark):
         """Analysis should output values in mmol/L when configured."""
-        with patch.object(cgm_module, "DB_PATH", populated_db):
-            with patch.object(cgm_module, "ensure_data", return_value=True):
-                with patch.object(cgm_module, "use_mmol", return_value=True):
-                    with patch.object(cgm_module, "get_unit_label", return_value="mmol/L"):
-                        with patch.object(cgm_module, "get_thresholds", return_value={
-                            "urgent_low": 55, "target_low": 70,
-                            "target_high": 180, "urgent_high": 250
-                        }):
-                            result = cgm_module.analyze_cgm(days=7)
-                            
-                            assert result["unit"] == "mmol/L"
-                            # Values should be in mmol range (typically 2-25)
-                            assert result["statistics"]["mean"] < 30
-    
+        result = benchmark(cgm_module.analyze_cgm, days=7)
+
+        assert result["unit"] == "mmol/L"
+        # Values should be in mmol range (typically 2-25)
+        assert result["statistics"]["mean"] < 30
+
     def test_view_day_in_mmol(self, cgm_module, populated_db):
         """Day view should show values in mmol/L when configured."""
-        with patch.object(cgm_module, "DB_PATH", populated_db):
-            with patch.object(cgm_module, "ensure_data", return_value=True):
-                with patch.object(cgm_module, "use_mmol", return_value=True):
-                    with patch.object(cgm_module, "get_unit_label", return_value="mmol/L"):
-                        with patch.object(cgm_module, "get_thresholds", return_value={
-                            "urgent_low": 55, "target_low": 70,
-                            "target_high": 180, "urgent_high": 250
-                        }):
-                            result = cgm_module.view_day("today")
-                            
-                            assert result["unit"] == "mmol/L"
-                            for reading in result.get("readings", []):
-                                # Values should be in mmol range
-                                assert reading["glucose"] < 30
+        result = cgm_module.view_day("today")
 
+        assert result["unit"] == "mmol/L"
+        for reading in result.get("readings", []):
+            # Values should be in mmol range
+            assert reading["glucose"] < 30
 
+
+@pytest.mark.usefixtures("default_cgm_env")
 class TestDataIntegrity:
     """Tests for data integrity checks."""
     
-    def test_handles_null_values(self, cgm_module, temp_db):
+    def test_handles_null_values(self, cgm_module, mem_db, bulk_insert, monkeypatch, test_now):
         """Should handle NULL values in database."""
-        conn = sqlite3.connect(temp_db)
-        now = datetime.now(timezone.utc)
+        now = test_now
         
         # Insert reading with NULL direction
-        conn.execute(
-            "INSERT INTO readings (id, sgv, date_ms, date_string, direction) VALUES (?, ?, ?, ?, ?)",
-            ("null_test", 120, int(now.timestamp() * 1000), now.isoformat(), None)
-        )
-        conn.commit()
-        conn.close()
+        bulk_insert(mem_db, [("null_test", 120, int(now.timestamp() * 1000), now.isoformat(), None)])
         
-        with patch.object(cgm_module, "DB_PATH", temp_db):
-            with patch.object(cgm_module, "ensure_data", return_value=True):
-                with patch.object(cgm_module, "use_mmol", return_value=False):
-                    with patch.object(cgm_module, "get_thresholds", return_value={
-                        "urgent_low": 55, "target_low": 70,
-                        "target_high": 180, "urgent_high": 250
-                    }):
-                        result = cgm_module.view_day("today")
-                        # Should not crash
-                        assert result is not None
-    
-    def test_handles_invalid_date_string(self, cgm_module, temp_db):
+        monkeypatch.setattr(cgm_module, "DB_PATH", mem_db)
+        result = cgm_module.view_day("today")
+        # Should not crash
+        assert result is not None
+
+    def test_handles_invalid_date_string(self, cgm_module, mem_db, bulk_insert, monkeypatch, test_now):
         """Should handle invalid date strings in database."""
-        conn = sqlite3.connect(temp_db)
-        now = datetime.now(timezone.utc)
+        now = test_now
         
         # Insert reading with invalid date string
-        conn.execute(
-            "INSERT INTO readings (id, sgv, date_ms, date_string, direction) VALUES (?, ?, ?, ?, ?)",
-            ("bad_date", 120, int(now.timestamp() * 1000), "not-a-date", "Flat")
-        )
-        conn.commit()
-        conn.close()
+        bulk_insert(mem_db, [("bad_date", 120, int(now.timestamp() * 1000), "not-a-date", "Flat")])
         
-        with patch.object(cgm_module, "DB_PATH", temp_db):
-            with patch.object(cgm_module, "ensure_data", return_value=True):
-                with patch.object(cgm_module, "use_mmol", return_value=False):
-                    with patch.object(cgm_module, "get_thresholds", return_value={
-                        "urgent_low": 55, "target_low": 70,
-                        "target_high": 180, "urgent_high": 250
-                    }):
-                        result = cgm_module.analyze_cgm(days=1)
-                        # Should not crash
-                        assert result is not None
-    
-    def test_handles_zero_sgv(self, cgm_module, temp_db):
+        monkeypatch.setattr(cgm_module, "DB_PATH", mem_db)
+        result = cgm_module.analyze_cgm(days=1)
+        # Should not crash
+        assert result is not None
+
+    def test_handles_zero_sgv(self, cgm_module, mem_db, bulk_insert, monkeypatch, test_now):
         """Should filter out zero SGV values."""
-        conn = sqlite3.connect(temp_db)
-        now = datetime.now(timezone.utc)
+        now = test_now
         
-        # Insert readings including zero
-        for i, sgv in enumerate([0, 120, 0, 140, 0]):
-            dt = now - timedelta(minutes=i*5)
-            conn.execute(
-                "INSERT INTO readings (id, sgv, date_ms, date_string, direction) VALUES (?, ?, ?, ?, ?)",
-                (f"zero_test_{i}", sgv, int(dt.timestamp() * 1000), dt.isoformat(), "Flat")
-            )
-        conn.commit()
-        conn.close()
+        # Insert readings including zero; analyze_cgm only reads date_ms, so one date_string will do
+        base_ms = int(now.timestamp() * 1000)
+        iso = now.isoformat()
+        bulk_insert(mem_db, [
+            (f"zero_test_{i}", sgv, base_ms - i * 300_000, iso, "Flat")
+            for i, sgv in enumerate([0, 120, 0, 140, 0])
+        ])
         
-        with patch.object(cgm_module, "DB_PATH", temp_db):
-            with patch.object(cgm_module, "ensure_data", return_value=True):
-                with patch.object(cgm_module, "use_mmol", return_value=False):
-                    with patch.object(cgm_module, "get_thresholds", return_value={
-                        "urgent_low": 55, "target_low": 70,
-                        "target_high": 180, "urgent_high": 250
-                    }):
-                        result = cgm_module.analyze_cgm(days=1)
-                        # Should only count non-zero readings
-                        assert result["readings"] == 2  # 120 and 140
+        monkeypatch.setattr(cgm_module, "DB_PATH", mem_db)
+        result = cgm_module.analyze_cgm(days=1)
+        # Should only count non-zero readings
+        assert result["readings"] == 2  # 120 and 140
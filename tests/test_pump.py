@@ -193,7 +193,7 @@ class TestCapabilityDetection:
                 mock_resp.json.return_value = mock_profile_response
             return mock_resp
         
-        with patch("requests.get", side_effect=mock_get):
+        with patch("requests.Session.get", side_effect=mock_get):
             with patch.object(cgm_module, "_load_config", return_value={}):
                 with patch.object(cgm_module, "_save_config"):
                     caps = cgm_module.detect_pump_capabilities()
@@ -214,7 +214,7 @@ class TestCapabilityDetection:
             mock_resp.json.return_value = []  # Empty responses
             return mock_resp
         
-        with patch("requests.get", side_effect=mock_get):
+        with patch("requests.Session.get", side_effect=mock_get):
             with patch.object(cgm_module, "_load_config", return_value={}):
                 with patch.object(cgm_module, "_save_config"):
                     caps = cgm_module.detect_pump_capabilities()
@@ -229,7 +229,7 @@ class TestCapabilityDetection:
         """Should use cached capabilities instead of making API calls."""
         cgm_module._pump_capabilities = mock_capabilities_with_pump
         
-        with patch("requests.get") as mock_get:
+        with patch("requests.Session.get") as mock_get:
             caps = cgm_module.detect_pump_capabilities()
         
         # Should not make any API calls
@@ -260,7 +260,7 @@ class TestGetPumpStatus:
         mock_resp.json.return_value = mock_devicestatus_response
         mock_resp.raise_for_status = MagicMock()
         
-        with patch("requests.get", return_value=mock_resp):
+        with patch("requests.Session.get", return_value=mock_resp):
             result = cgm_module.get_pump_status()
         
         assert "error" not in result
@@ -291,7 +291,7 @@ class TestGetPumpStatus:
         mock_resp.json.return_value = []
         mock_resp.raise_for_status = MagicMock()
         
-        with patch("requests.get", return_value=mock_resp):
+        with patch("requests.Session.get", return_value=mock_resp):
             result = cgm_module.get_pump_status()
         
         assert "error" in result
@@ -301,7 +301,7 @@ class TestGetPumpStatus:
         cgm_module._pump_capabilities = mock_capabilities_with_pump
         
         import requests
-        with patch("requests.get", side_effect=requests.RequestException("Network error")):
+        with patch("requests.Session.get", side_effect=requests.RequestException("Network error")):
             result = cgm_module.get_pump_status()
         
         assert "error" in result
@@ -323,7 +323,7 @@ class TestGetTreatments:
         mock_resp.json.return_value = mock_treatments_response
         mock_resp.raise_for_status = MagicMock()
         
-        with patch("requests.get", return_value=mock_resp):
+        with patch("requests.Session.get", return_value=mock_resp):
             result = cgm_module.get_treatments(hours=24)
         
         assert "error" not in result
@@ -351,7 +351,7 @@ class TestGetTreatments:
         mock_resp.json.return_value = []
         mock_resp.raise_for_status = MagicMock()
         
-        with patch("requests.get", return_value=mock_resp):
+        with patch("requests.Session.get", return_value=mock_resp):
             result = cgm_module.get_treatments()
         
         assert "error" not in result
@@ -366,7 +366,7 @@ class TestGetTreatments:
         mock_resp.json.return_value = []
         mock_resp.raise_for_status = MagicMock()
         
-        with patch("requests.get", return_value=mock_resp) as mock_get:
+        with patch("requests.Session.get", return_value=mock_resp) as mock_get:
             cgm_module.get_treatments(hours=6)
         
         # Check that the time filter was applied
@@ -389,7 +389,7 @@ class TestGetProfile:
         mock_resp.json.return_value = mock_profile_response
         mock_resp.raise_for_status = MagicMock()
         
-        with patch("requests.get", return_value=mock_resp):
+        with patch("requests.Session.get", return_value=mock_resp):
             result = cgm_module.get_profile()
         
         assert "error" not in result
@@ -411,7 +411,7 @@ class TestGetProfile:
         mock_resp.json.return_value = mock_profile_response
         mock_resp.raise_for_status = MagicMock()
         
-        with patch("requests.get", return_value=mock_resp):
+        with patch("requests.Session.get", return_value=mock_resp):
             result = cgm_module.get_profile()
         
         # Should calculate: 10.5 hrs * 1.2 + 8.5 hrs * 1.0 + 5 hrs * 1.2
@@ -426,7 +426,7 @@ class TestGetProfile:
         mock_resp.json.return_value = mock_profile_response
         mock_resp.raise_for_status = MagicMock()
         
-        with patch("requests.get", return_value=mock_resp):
+        with patch("requests.Session.get", return_value=mock_resp):
             result = cgm_module.get_profile()
         
         assert result["loop_settings"]["maximum_bolus"] == 7
@@ -441,7 +441,7 @@ class TestGetProfile:
         mock_resp.json.return_value = mock_profile_response
         mock_resp.raise_for_status = MagicMock()
         
-        with patch("requests.get", return_value=mock_resp):
+        with patch("requests.Session.get", return_value=mock_resp):
             result = cgm_module.get_profile()
         
         assert len(result["override_presets"]) == 1
@@ -569,7 +569,7 @@ class TestPumpEdgeCases:
         mock_resp.json.return_value = response
         mock_resp.raise_for_status = MagicMock()
         
-        with patch("requests.get", return_value=mock_resp):
+        with patch("requests.Session.get", return_value=mock_resp):
             result = cgm_module.get_pump_status()
         
         assert "error" not in result
@@ -593,7 +593,7 @@ class TestPumpEdgeCases:
         mock_resp.json.return_value = response
         mock_resp.raise_for_status = MagicMock()
         
-        with patch("requests.get", return_value=mock_resp):
+        with patch("requests.Session.get", return_value=mock_resp):
             result = cgm_module.get_profile()
         
         assert "error" not in result
@@ -617,7 +617,7 @@ class TestPumpEdgeCases:
         mock_resp.json.return_value = response
         mock_resp.raise_for_status = MagicMock()
         
-        with patch("requests.get", return_value=mock_resp):
+        with patch("requests.Session.get", return_value=mock_resp):
             result = cgm_module.get_treatments()
         
         assert len(result["boluses"]) == 2
@@ -45,6 +45,14 @@ class TestConvertGlucose:
             # 400 mg/dL ≈ 22.2 mmol/L
             assert cgm_module.convert_glucose(400) == pytest.approx(22.2, rel=0.1)
 
+    def test_converter_matches_convert_glucose(self, cgm_module):
+        """The hoisted converter should agree with convert_glucose in both modes."""
+        for mmol in (False, True):
+            with patch.object(cgm_module, "use_mmol", return_value=mmol):
+                convert = cgm_module._glucose_converter()
+                for value in (40, 70, 100, 180, 400):
+                    assert convert(value) == cgm_module.convert_glucose(value)
+
 
 class TestGetStats:
     """Tests for get_stats function."""
@@ -93,6 +101,8 @@ class TestGetStats:
                 values = [80, 100, 120, 140, 160]
                 stats = cgm_module.get_stats(values)
                 assert stats["std"] > 0
+                # Population std: sqrt(mean of squared deviations) = sqrt(800)
+                assert stats["std"] == 28.3
     
     def test_unsorted_input(self, cgm_module):
         """Function should handle unsorted input."""
@@ -104,6 +114,15 @@ class TestGetStats:
                 assert stats["min"] == 100
                 assert stats["max"] == 180
 
+    def test_median_with_duplicates(self, cgm_module):
+        """Median should match the upper-middle element of the sorted values."""
+        with patch.object(cgm_module, "use_mmol", return_value=False):
+            with patch.object(cgm_module, "get_unit_label", return_value="mg/dL"):
+                values = [150, 90, 120, 120, 200, 90]
+                stats = cgm_module.get_stats(values)
+
+                assert stats["median"] == sorted(values)[len(values) // 2]
+
 
 class TestGetTimeInRange:
     """Tests for get_time_in_range function."""
@@ -282,7 +301,16 @@ class TestParseDateArg:
         
         with pytest.raises(ValueError):
             cgm_module.parse_date_arg("32/13/2026")
-    
+
+    def test_cached_relative_to_current_date(self, cgm_module):
+        """Cached results must follow the current date, not the first call's."""
+        day = datetime(2025, 3, 10).date()
+        next_day = day + timedelta(days=1)
+
+        assert cgm_module._parse_date_on("today", day) == day
+        assert cgm_module._parse_date_on("today", next_day) == next_day
+        assert cgm_module._parse_date_on("jan 15", next_day).year == 2025
+
     def test_slash_format(self, cgm_module):
         """Slash format should work."""
         result = cgm_module.parse_date_arg("01/15")
@@ -320,6 +348,15 @@ class TestGetThresholds:
             assert thresholds["target_high"] == 160
             assert thresholds["urgent_high"] == 220
 
+    def test_memoized_until_settings_change(self, cgm_module):
+        """Thresholds are reused for the same settings and recomputed after a refetch."""
+        cgm_module._cached_settings = {"thresholds": {"bgTargetTop": 160}}
+        first = cgm_module.get_thresholds()
+        assert cgm_module.get_thresholds() is first
+
+        cgm_module._cached_settings = {"thresholds": {"bgTargetTop": 200}}
+        assert cgm_module.get_thresholds()["target_high"] == 200
+
 
 class TestUseMmol:
     """Tests for use_mmol function."""
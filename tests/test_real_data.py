@@ -5,6 +5,7 @@ These tests ensure cgm.py correctly handles the actual format
 returned by Nightscout, including all fields and edge cases.
 """
 import sqlite3
+import pytest
 from datetime import datetime, timezone
 from unittest.mock import MagicMock, patch
 
@@ -63,6 +64,7 @@ class TestRealDataFormat:
         assert has_extra, "Expected real data to have extra fields like utcOffset"
 
 
+@pytest.mark.usefixtures("default_cgm_env")
 class TestRealDataStorage:
     """Test storing real Nightscout data in our database."""
     